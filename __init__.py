@@ -3,4 +3,5 @@
 
 from . import models
 from . import common
-from . import tests
\ No newline at end of file
+from . import tests
+from .hooks import uninstall_hook
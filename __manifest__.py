@@ -12,8 +12,11 @@
     'demo': [
     ],
     'data': [
+        'security/ir.model.access.csv',
         'data/stock_config.xml',
+        'data/cron.xml',
         'views/product_template.xml',
+        'views/res_users.xml',
         'views/stock_location.xml',
         'views/stock_picking.xml',
     ],
@@ -21,6 +24,7 @@
     ],
     'test': [
     ],
+    'uninstall_hook': 'uninstall_hook',
     'installable': True,
     'application': False,
     'auto_install': False,
@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
+import functools
+import json
+from collections import OrderedDict
+
 from odoo.exceptions import ValidationError
+from odoo.models import BaseModel
 from odoo.tools.translate import _
 
 
@@ -11,6 +16,89 @@ def check_many2one_validity(field, obj, id_):
     :param id_: (int) id of the record referenced by the field
     :return:
     """
-    if not obj.search([('id', '=', id_)]):
-        raise ValidationError(_('The %s supplied (%s) is not valid, '
-                                'it does not exist.') % (field, id_))
+    check_many2one_validities([(field, obj, id_)])
+
+
+def check_many2one_validities(references):
+    """
+    Raise an error listing every reference whose id does not exist for its
+    object, with one query per model
+    :param references: (list) of (field, obj, id_) tuples, where field
+        is the field name, obj a recordset of the model referenced and
+        id_ the id of the record referenced by the field
+    :return:
+    """
+    def to_int(id_):
+        # like search(), accept ids given as strings, e.g. '5'
+        try:
+            return int(id_) if id_ else None
+        except (TypeError, ValueError):
+            return None
+
+    ids_by_obj = OrderedDict()
+    for _field, obj, id_ in references:
+        id_ = to_int(id_)
+        if id_:
+            ids_by_obj.setdefault(obj._name, (obj, set()))[1].add(id_)
+
+    valid = set()
+    for model, (obj, ids) in ids_by_obj.items():
+        # same filters as search(), i.e., active records and record rules
+        query = obj._where_calc([('id', 'in', list(ids))])
+        obj._apply_ir_rules(query, 'read')
+        from_clause, where_clause, params = query.get_sql()
+        obj.env.cr.execute('SELECT "%s".id FROM %s WHERE %s' %
+                           (obj._table, from_clause, where_clause), params)
+        valid.update((model, id_) for id_, in obj.env.cr.fetchall())
+
+    errors = [_('The %s supplied (%s) is not valid, it does not exist.') %
+              (field, id_)
+              for field, obj, id_ in references
+              if (obj._name, to_int(id_)) not in valid]
+    if errors:
+        raise ValidationError('\n'.join(errors))
+
+
+def serialize_result(result):
+    """
+    JSON encode the value returned by a model method, recordsets are
+    encoded as their model name and ids
+    :param result: value to encode
+    :return: (str)
+    """
+    if isinstance(result, BaseModel):
+        result = {'_model': result._name, 'ids': result.ids}
+    return json.dumps(result, default=str)
+
+
+def deserialize_result(env, value):
+    """
+    Decode a value encoded by serialize_result(), recordsets are browsed
+    in env
+    :param env: (Environment)
+    :param value: (str)
+    :return: decoded value
+    """
+    result = json.loads(value)
+    if isinstance(result, dict) and '_model' in result:
+        result = env[result['_model']].browse(result['ids'])
+    return result
+
+
+def idempotent(method):
+    """
+    Decorator for model methods that accept an optional idempotency_key
+    keyword argument. The result of the first call with a key is stored
+    and returned by any later call with the same key, without executing
+    the method again.
+    :param method: model method
+    :return: decorated method
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = kwargs.pop('idempotency_key', None)
+        if not key:
+            return method(self, *args, **kwargs)
+        IdempotencyKey = self.env['udes.idempotency.key']
+        return IdempotencyKey.call(key, self, method, *args, **kwargs)
+    return wrapper
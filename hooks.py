@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+from .models.udes_scan_identifier import (IDENTIFIER_SOURCES,
+                                          IDENTIFIER_TRIGGERS, _function_name)
+from .models.udes_sync_tombstone import SYNC_TABLES
+
+
+def uninstall_hook(cr, registry):
+    """ Remove the database objects created outside of the ORM
+    """
+    cr.execute("""
+        DROP TRIGGER IF EXISTS udes_stock_level_trigger ON stock_quant;
+        DROP FUNCTION IF EXISTS udes_stock_level_update();
+    """)
+    for table in IDENTIFIER_TRIGGERS:
+        cr.execute("""
+            DROP TRIGGER IF EXISTS {function}_trigger ON {table};
+            DROP FUNCTION IF EXISTS {function}();
+        """.format(function=_function_name(table), table=table))
+    for model in IDENTIFIER_SOURCES:
+        cr.execute("DROP FUNCTION IF EXISTS {}(integer[])".format(
+            _function_name(model)))
+    for table in SYNC_TABLES:
+        cr.execute("""
+            DROP TRIGGER IF EXISTS udes_sync_txid_trigger ON {table};
+            DROP TRIGGER IF EXISTS udes_sync_tombstone_trigger ON {table};
+            DROP FUNCTION IF EXISTS udes_sync_tombstone_{table}();
+            ALTER TABLE {table} DROP COLUMN IF EXISTS u_sync_txid;
+        """.format(table=table))
+    cr.execute("DROP FUNCTION IF EXISTS udes_sync_txid_update()")
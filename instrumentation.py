@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+import base64
+import cProfile
+import functools
+import io
+import json
+import logging
+import marshal
+import pstats
+import time
+import zipfile
+
+from .replica import primary_env
+
+_logger = logging.getLogger(__name__)
+
+
+class CallMetrics(object):
+    """ Context manager collecting the wall time, number of SQL queries,
+        time spent in SQL and rows returned or affected by the queries
+        (records touched) on a cursor while it is active.
+
+        When trace is True, the text, duration and row count of each
+        query are also kept in sql_trace.
+    """
+
+    def __init__(self, cr, trace=False):
+        self.cr = cr
+        self.trace = trace
+        self.wall_time = 0.0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.records = 0
+        self.sql_trace = []
+
+    def _execute(self, execute):
+        """ Wrap the execute method of the cursor to collect metrics """
+        @functools.wraps(execute)
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return execute(*args, **kwargs)
+            finally:
+                duration = time.time() - start
+                rowcount = max(self.cr.rowcount, 0)
+                self.sql_time += duration
+                self.queries += 1
+                self.records += rowcount
+                if self.trace:
+                    self.sql_trace.append({
+                        'query': str(args[0] if args else kwargs.get('query')),
+                        'duration': round(duration, 6),
+                        'rows': rowcount,
+                    })
+        return wrapper
+
+    def __enter__(self):
+        # keep the execute method of an enclosing CallMetrics, if any
+        self._previous_execute = self.cr.__dict__.get('execute')
+        self.cr.execute = self._execute(self.cr.execute)
+        self._start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wall_time = time.time() - self._start
+        if self._previous_execute is not None:
+            self.cr.execute = self._previous_execute
+        else:
+            # restore the execute method of the cursor class
+            del self.cr.execute
+
+    def to_dict(self):
+        return {
+            'wall_time': round(self.wall_time, 6),
+            'queries': self.queries,
+            'sql_time': round(self.sql_time, 6),
+            'records': self.records,
+        }
+
+
+def _profile_attachment_values(name, profiler, metrics):
+    """ Return the values of an ir.attachment with a zip file containing
+        the profile of a call, readable by pstats (profile.prof) and as
+        text (profile.txt), and its SQL trace (sql_trace.json).
+    """
+    profiler.create_stats()
+    stats = io.StringIO()
+    pstats.Stats(profiler, stream=stats).sort_stats('cumulative').print_stats()
+
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('profile.prof', marshal.dumps(profiler.stats))
+        archive.writestr('profile.txt', stats.getvalue())
+        archive.writestr('sql_trace.json', json.dumps(
+            dict(metrics.to_dict(), method=name, queries=metrics.sql_trace),
+            indent=4))
+    filename = 'profile_{}_{}.zip'.format(
+        name, time.strftime('%Y%m%d_%H%M%S', time.gmtime()))
+    return {
+        'name': filename,
+        'datas_fname': filename,
+        'datas': base64.b64encode(data.getvalue()),
+        'description': name,
+        'mimetype': 'application/zip',
+    }
+
+
+def _save_profile(env, values):
+    """ Store the profile attachment linked to the user of env """
+    # the call might have run on the read only database
+    Attachment = primary_env(env)['ir.attachment'].sudo()
+    values = dict(values, res_model='res.users', res_id=env.uid)
+    Attachment.create(values)
+
+
+def instrumented(method):
+    """
+    Decorator for public model methods collecting CallMetrics of each
+    call. Nested instrumented calls are accounted in the outermost one.
+
+    - Calls slower than the system parameter udes_core.api_metrics_threshold
+      (seconds, 1 by default, negative to disable) are logged.
+    - When the context variable udes_metrics is set, the method returns a
+      dictionary with the result in key result and the metrics in key
+      udes_metrics.
+    - When the context variable udes_profile is set or the user has
+      u_profile_api_calls enabled, the call is profiled and the profile
+      and SQL trace are stored in an attachment of the user.
+    :param method: model method
+    :return: decorated method
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cr = self.env.cr
+        if getattr(cr, '_udes_metrics', None) is not None:
+            return method(self, *args, **kwargs)
+
+        name = '{}.{}'.format(self._name, method.__name__)
+        profile = self.env.context.get('udes_profile') or \
+            self.env.user.u_profile_api_calls
+        profiler = cProfile.Profile() if profile else None
+        error = None
+        with CallMetrics(cr, trace=profile) as metrics:
+            cr._udes_metrics = metrics
+            if profiler:
+                profiler.enable()
+            try:
+                result = method(self, *args, **kwargs)
+            except Exception as e:
+                error = e
+            finally:
+                if profiler:
+                    profiler.disable()
+                cr._udes_metrics = None
+
+        if profiler:
+            values = _profile_attachment_values(name, profiler, metrics)
+            if error is None:
+                _save_profile(self.env, values)
+            else:
+                # the transaction is going to be rolled back, keep the
+                # profile of the failed call in a new one
+                with self.pool.cursor() as profile_cr:
+                    _save_profile(self.env(cr=profile_cr), values)
+
+        if error is not None:
+            raise error
+
+        Config = self.env['ir.config_parameter'].sudo()
+        threshold = float(Config.get_param('udes_core.api_metrics_threshold', 1))
+        if 0 <= threshold <= metrics.wall_time:
+            _logger.info('UDES API call %s', json.dumps(dict(
+                metrics.to_dict(), method=name, uid=self.env.uid,
+                records_in_self=len(self))))
+
+        if self.env.context.get('udes_metrics'):
+            return {'result': result, 'udes_metrics': metrics.to_dict()}
+        return result
+    return wrapper
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from . import udes_bulk_archive_mixin
 from . import product_product
 from . import product_template
 from . import stock_location
@@ -11,3 +12,10 @@ from . import stock_quant
 from . import stock_quant_package
 from . import stock_warehouse
 from . import res_users
+from . import udes_job
+from . import udes_idempotency_key
+from . import udes_stock_level
+from . import udes_slow_query
+from . import udes_stock_import
+from . import udes_scan_identifier
+from . import udes_sync_tombstone
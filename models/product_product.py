@@ -3,9 +3,13 @@
 from odoo import fields, models, _
 from odoo.exceptions import ValidationError
 
+from ..instrumentation import instrumented
+from ..replica import read_replica
+
 
 class ProductProduct(models.Model):
-    _inherit = "product.product"
+    _name = "product.product"
+    _inherit = ["product.product", "udes.bulk.archive.mixin"]
 
     # Add tracking for archiving.
     active = fields.Boolean(track_visibility='onchange')
@@ -67,6 +71,8 @@ class ProductProduct(models.Model):
 
         return res
 
+    @read_replica
+    @instrumented
     def get_product(self, product_identifier):
         """ Get product from a name, barcode, or id.
         """
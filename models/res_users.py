@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, models, _
+from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError, UserError
 
 
@@ -8,6 +8,11 @@ class ResUser(models.Model):
 
     _inherit = 'res.users'
 
+    u_profile_api_calls = fields.Boolean(
+        'Profile API Calls', default=False,
+        help='Profile the UDES API calls of the user and store the '
+             'profiles as attachments of the user')
+
     def get_user_warehouse(self):
         """ Get the warehouse of the user by chain of the company
         """
@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
 
-from odoo import fields, models,  _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 
+from ..instrumentation import instrumented
+from ..replica import read_replica
+
 
 class StockLocation(models.Model):
     _name = 'stock.location'
     # Add messages to locations.
-    _inherit = ['stock.location', 'mail.thread']
+    _inherit = ['stock.location', 'mail.thread', 'udes.bulk.archive.mixin']
 
     # Disable translation instead of renaming.
     name = fields.Char(translate=False)
@@ -15,6 +18,140 @@ class StockLocation(models.Model):
     # Add tracking for archiving.
     active = fields.Boolean(track_visibility='onchange')
 
+    def _get_bulk_archive_thread(self, records):
+        """ Post the aggregated message of a bulk archive on the closest
+            common ancestor of the locations, e.g., the aisle of the bins.
+        """
+        self.env.cr.execute("""
+            SELECT ancestor.id
+            FROM stock_location ancestor,
+                 (SELECT MIN(parent_left) AS parent_left,
+                         MAX(parent_right) AS parent_right
+                  FROM stock_location
+                  WHERE id = ANY(%s)) bounds
+            WHERE ancestor.parent_left <= bounds.parent_left
+              AND ancestor.parent_right >= bounds.parent_right
+            ORDER BY ancestor.parent_left DESC
+            LIMIT 1
+        """, (records.ids,))
+        row = self.env.cr.fetchone()
+        if not row:
+            return super(StockLocation, self)._get_bulk_archive_thread(records)
+        return self.browse(row[0])
+
+    @api.model
+    def create(self, vals):
+        """ Reset the location tree index, creating a location changes
+            the intervals of the tree.
+        """
+        location = super(StockLocation, self).create(vals)
+        self._location_tree_changed()
+        return location
+
+    def write(self, vals):
+        """ Reset the location tree index when locations are moved or
+            archived.
+        """
+        res = super(StockLocation, self).write(vals)
+        if set(vals) & {'location_id', 'active', 'parent_left',
+                        'parent_right'}:
+            self._location_tree_changed()
+        return res
+
+    def unlink(self):
+        """ Reset the location tree index when locations are deleted
+        """
+        res = super(StockLocation, self).unlink()
+        self._location_tree_changed()
+        return res
+
+    def _bulk_set_active(self, active, defer_tracking=False):
+        """ Reset the location tree index when locations are archived
+            or unarchived in SQL.
+        """
+        changed = super(StockLocation, self)._bulk_set_active(
+            active, defer_tracking=defer_tracking)
+        if changed:
+            self._location_tree_changed()
+        return changed
+
+    @api.model
+    def _parent_store_compute(self):
+        """ Reset the location tree index when the intervals of the
+            tree are computed in SQL.
+        """
+        res = super(StockLocation, self)._parent_store_compute()
+        self._location_tree_changed()
+        return res
+
+    @api.model
+    def _location_tree_changed(self):
+        """ Stop using the cached index of the location tree in the
+            current transaction, which has changed the tree, and clear it
+            once the transaction ends. Clearing the registry caches
+            before would let other transactions of the process cache the
+            tree as it was, or as it is in this transaction. The other
+            processes clear their index with the registry cache
+            signaling.
+        """
+        cr = self.env.cr
+        if getattr(cr, '_udes_location_tree_changed', False):
+            return
+        cr._udes_location_tree_changed = True
+        registry = self.pool
+
+        def clear():
+            cr._udes_location_tree_changed = False
+            registry.clear_caches()
+
+        cr.after('commit', clear)
+        cr.after('rollback', clear)
+
+    @api.model
+    def _get_location_intervals(self):
+        """ Return a dictionary mapping the id of every active location to
+            its (parent_left, parent_right) interval in the location tree.
+
+            The result is cached per registry, except in the transactions
+            changing the tree, and cleared when they end.
+        """
+        if getattr(self.env.cr, '_udes_location_tree_changed', False):
+            return self._read_location_intervals()
+        return self._get_cached_location_intervals()
+
+    @api.model
+    @tools.ormcache()
+    def _get_cached_location_intervals(self):
+        """ Return the intervals of the active locations, cached """
+        return self._read_location_intervals()
+
+    @api.model
+    def _read_location_intervals(self):
+        """ Return the intervals of the active locations """
+        self.env.cr.execute("""
+            SELECT id, parent_left, parent_right FROM stock_location
+            WHERE active
+        """)
+        return {id_: (left, right)
+                for id_, left, right in self.env.cr.fetchall()}
+
+    def filter_children_of(self, location_id):
+        """ Return the locations in self that are location_id or one of
+            its children, using the cached intervals of the location
+            tree instead of a child_of search.
+        """
+        intervals = self._get_location_intervals()
+        if any(intervals.get(id_, (None, None))[0] is None
+               for id_ in [location_id] + self.ids):
+            # locations not in the index or intervals not computed yet
+            # (e.g. deferred parent store computation), use the database
+            return self.search([('id', 'child_of', location_id),
+                                ('id', 'in', self.ids)])
+        left, right = intervals[location_id]
+        return self.filtered(
+            lambda loc: left <= intervals[loc.id][0] and
+                        intervals[loc.id][1] <= right)
+
     def _prepare_info(self, extended=False, load_quants=False):
         """
             Prepares the following info of the location in self:
@@ -45,6 +182,8 @@ class StockLocation(models.Model):
 
         return res
 
+    @read_replica
+    @instrumented
     def get_location(self, location_identifier):
         """ Get locations from a name, barcode, or id.
         """
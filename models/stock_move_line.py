@@ -30,6 +30,8 @@ class StockMoveLine(models.Model):
             - products_info = list of dictionaries, whose keys will be
                               product_barcode, qty, serial_numbers
         """
+        # the records are read to be written, not from the replica
+        self = self.with_context(udes_no_replica=True)
         MoveLine = self.env['stock.move.line']
         Location = self.env['stock.location']
         Package = self.env['stock.quant.package']
@@ -1,16 +1,45 @@
 # -*- coding: utf-8 -*-
 
+import functools
+import json
+import logging
+import time
 from collections import OrderedDict
 
+from psycopg2 import OperationalError, errorcodes
+
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
-
-from ..common import check_many2one_validity
+from odoo.service.model import PG_CONCURRENCY_ERRORS_TO_RETRY
+
+from ..common import check_many2one_validities, idempotent
+from ..instrumentation import instrumented
+from ..replica import read_replica
+
+_logger = logging.getLogger(__name__)
+
+def serialized_update(method):
+    """
+    Decorator for picking methods taking the update lock of the picking,
+    before anything else runs in the call, so concurrent updates of the
+    same picking (e.g., two users scanning the same receipt) run one after
+    the other instead of racing on the move line splits.
+    :param method: model method
+    :return: decorated method
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._acquire_update_lock()
+        return method(self, *args, **kwargs)
+    return wrapper
 
 
 class StockPicking(models.Model):
     _inherit = 'stock.picking'
 
+    # methods that can be run by udes.job
+    _udes_job_methods = ('_action_done_locked', '_create_pickings_group_job')
+
     # compute previous and next pickings
     u_prev_picking_ids = fields.One2many(
         'stock.picking', string='Previous Pickings',
@@ -56,6 +85,56 @@ class StockPicking(models.Model):
         if self.state in ['done', 'cancel']:
             raise ValidationError(_('Wrong state of picking %s') % self.state)
 
+    def _acquire_update_lock(self):
+        """ Take a transaction level advisory lock on the picking in self,
+            so concurrent updates of the same picking run one after the
+            other.
+
+            While another transaction holds it, wait for up to
+            udes_core.picking_lock_timeout seconds (30 by default) for it
+            to finish. The snapshot of the current transaction does not
+            see the changes of the other one, so then a serialization
+            failure is raised for the request to be retried in a new
+            transaction.
+        """
+        self.ensure_one()
+        self.env.cr.execute("""
+            SELECT pg_try_advisory_xact_lock(
+                'stock_picking'::regclass::oid::integer, %s)
+        """, (self.id,))
+        if self.env.cr.fetchone()[0]:
+            return
+
+        Config = self.env['ir.config_parameter'].sudo()
+        timeout = float(Config.get_param('udes_core.picking_lock_timeout', 30))
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute("SET LOCAL lock_timeout = %s",
+                                    ('%dms' % max(timeout * 1000, 1),))
+                self.env.cr.execute("""
+                    SELECT pg_advisory_xact_lock(
+                        'stock_picking'::regclass::oid::integer, %s)
+                """, (self.id,), log_exceptions=False)
+        except OperationalError as e:
+            if e.pgcode != errorcodes.LOCK_NOT_AVAILABLE:
+                raise
+            raise ValidationError(
+                    _('Picking %s is being updated by another user, '
+                      'please try again.') % self.name)
+        self.env.cr.execute("""
+            DO $$ BEGIN
+                RAISE EXCEPTION USING ERRCODE = 'serialization_failure',
+                    MESSAGE = 'picking {} was updated concurrently';
+            END $$
+        """.format(int(self.id)), log_exceptions=False)
+
+    def _action_done_locked(self):
+        """ Validate the picking in self holding its update lock, run by
+            the jobs of asynchronous validations.
+        """
+        self._acquire_update_lock()
+        return self.action_done()
+
     def add_unexpected_parts(self, product_quantities):
         """ By default allow to overreceive and it will be extended in 
             a module where the picking type has a flag to decide this.
@@ -85,9 +164,13 @@ class StockPicking(models.Model):
 
         return new_move_lines
 
-    def _create_moves_from_quants(self, quant_ids, **kwargs):
+    def _create_moves_from_quants(self, quant_ids, move_parent_package=False,
+                                  **kwargs):
         """ Check that the quants are valid to be used in self and
             create moves calling _create_moves().
+
+            When move_parent_package is True, all the quants of the
+            pallets containing the packages of the quants are moved.
         """
         Quant = self.env['stock.quant']
 
@@ -99,13 +182,18 @@ class StockPicking(models.Model):
             quants = quant_ids
         else:
             raise ValidationError(_('Wrong quant identifiers %s') % type(quant_ids))
+        if move_parent_package:
+            quants = quants._with_parent_packages()
+        # fail fast if another operation is already using the quants,
+        # otherwise lock them until the moves are created
+        quants._lock_for_update()
         quants.assert_not_reserved()
         quants.assert_entire_packages()
         quants.assert_valid_location(self.location_id.id)
 
         # Call _create_moves() with context variable quants_ids in order
         # to filter the quants that stock.quant._gather returns
-        self.with_context(quant_ids=quant_ids)._create_moves(quants.group_quantity_by_product(),**kwargs)
+        self.with_context(quant_ids=quants.ids)._create_moves(quants.group_quantity_by_product(),**kwargs)
 
     def _create_moves(self, products_info, values=None,
                             confirm=False, assign=False,
@@ -137,14 +225,23 @@ class StockPicking(models.Model):
             default_uom_id = self.env.ref('product.product_uom_unit').id
             values['product_uom'] = default_uom_id
 
-        for product_id, qty in products_info.items():
-            move_vals = {
-                    'name': '{} {}'.format(qty, Product.browse(product_id).display_name),
-                    'product_id': product_id,
-                    'product_uom_qty': qty,
-                }
-            move_vals.update(values)
-            move = Move.create(move_vals)
+        # read the names of all the products at once instead of
+        # computing display_name product by product
+        products = Product.browse(list(products_info.keys()))
+        product_names = dict(products.name_get())
+
+        # delay the recomputation of stored fields (picking state,
+        # quantities, ...) until all the moves have been created
+        with self.env.norecompute():
+            for product_id, qty in products_info.items():
+                move_vals = {
+                        'name': '{} {}'.format(qty, product_names[product_id]),
+                        'product_id': product_id,
+                        'product_uom_qty': qty,
+                    }
+                move_vals.update(values)
+                Move.create(move_vals)
+        self.recompute()
 
         if confirm:
             # Use picking.action_confirm, which will merge moves of the same
@@ -163,6 +260,8 @@ class StockPicking(models.Model):
                 new_move_line_ids = self.move_line_ids - old_move_line_ids
                 new_move_line_ids.write({'result_package_id': package.id})
 
+    @instrumented
+    @idempotent
     def create_picking(
             self,
             quant_ids,
@@ -188,6 +287,10 @@ class StockPicking(models.Model):
             @param (optional) move_parent_package: Boolean
                 Used in pallets/nested packages, to maintain the move of the entire pallet.
                 Defaults to False
+            @param (optional) idempotency_key: string
+                Key generated by the client for this request, retries
+                with the same key return the picking created by the
+                first call instead of creating it again.
 
         """
         Picking = self.env['stock.picking']
@@ -206,11 +309,10 @@ class StockPicking(models.Model):
             location_dest_id = picking_type.default_location_dest_id.id
 
         # check params
-        for (field, obj, id_) in [
+        check_many2one_validities([
             ('location_id', Location, location_id),
             ('location_dest_id', Location, location_dest_id),
-        ]:
-            check_many2one_validity(field, obj, id_)
+        ])
 
         # Create stock.picking
         values = {
@@ -223,18 +325,171 @@ class StockPicking(models.Model):
         # Create stock.moves
         picking._create_moves_from_quants(quant_ids, values=values.copy(),
                                           confirm=True, assign=True,
-                                          result_package=result_package_id)
-
-        # TODO: this might be in the package_hierarchy module, because odoo by default
-        #       does not handle parent packages
-        if not move_parent_package:
-            # not needed yet
-            # when false remove parent_id of the result_package_id ??
-            #picking.move_line_ids.mapped('result_package_id').write({'package_id': False})
-            pass
+                                          result_package=result_package_id,
+                                          move_parent_package=move_parent_package)
 
         return picking
 
+    def _partition_picking_specs(self, specs):
+        """ Group the indexes of specs so that specs sharing quants or
+            packages (of the quants or result packages) are in the same
+            group, and different groups can be created concurrently.
+        """
+        quant_ids = list({quant_id for spec in specs
+                          for quant_id in spec.get('quant_ids') or []})
+        self.env.cr.execute("""
+            SELECT id, package_id FROM stock_quant
+            WHERE id = ANY(%s) AND package_id IS NOT NULL
+        """, (quant_ids,))
+        quant_packages = dict(self.env.cr.fetchall())
+
+        # union-find of the spec indexes
+        parents = list(range(len(specs)))
+
+        def find(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        owners = {}
+        for index, spec in enumerate(specs):
+            keys = []
+            for quant_id in spec.get('quant_ids') or []:
+                keys.append(('quant', quant_id))
+                if quant_id in quant_packages:
+                    keys.append(('package', quant_packages[quant_id]))
+            if spec.get('result_package_id'):
+                keys.append(('result_package', spec['result_package_id']))
+            for key in keys:
+                if key in owners:
+                    parents[find(index)] = find(owners[key])
+                else:
+                    owners[key] = index
+
+        groups = OrderedDict()
+        for index in range(len(specs)):
+            groups.setdefault(find(index), []).append(index)
+        return list(groups.values())
+
+    def _create_pickings_group(self, specs, group):
+        """ Create a picking for each spec of group, each one in its own
+            savepoint. Return a dictionary mapped by spec index with
+            (picking id, error message) tuples.
+        """
+        # create_picking returns the picking, not its metrics
+        Picking = self.with_context(udes_metrics=False)
+
+        results = {}
+        for index in group:
+            try:
+                with self.env.cr.savepoint():
+                    picking = Picking.create_picking(**specs[index])
+                results[index] = (picking.id, None)
+            except OperationalError as e:
+                if e.pgcode in PG_CONCURRENCY_ERRORS_TO_RETRY:
+                    # the whole transaction is retried, e.g., the job
+                    raise
+                results[index] = (False, str(e))
+            except Exception as e:
+                # e.g. a spec with missing or unexpected arguments
+                results[index] = (False, getattr(e, 'name', None) or str(e))
+        return results
+
+    @api.model
+    def _create_pickings_group_job(self, specs, indexes):
+        """ Job of create_pickings_bulk creating the pickings of specs,
+            the specs of indexes in the call. Return a list with the
+            index, picking id and error message of each spec.
+        """
+        results = self._create_pickings_group(dict(zip(indexes, specs)),
+                                              indexes)
+        return [[index] + list(results[index]) for index in indexes]
+
+    @api.model
+    def create_pickings_bulk(self, specs, use_jobs=False):
+        """ Create a picking for each spec in specs, by groups of specs
+            that do not share quants or packages.
+
+            @param specs: Array of dictionaries
+                Keyword arguments of create_picking, i.e., quant_ids,
+                location_id and optionally location_dest_id,
+                picking_type_id and result_package_id.
+            @param (optional) use_jobs: Boolean
+                Enqueue a udes.job per group instead of creating the
+                pickings in the current transaction, and return the jobs.
+                The job queue workers, i.e., the processes running
+                udes.job _process_jobs() such as the UDES: Process Jobs
+                cron, then create each group in its own transaction, in
+                parallel when several of them run, once the current
+                transaction is committed: they see its data, and no job
+                runs if it is rolled back. Their result is read with
+                get_pickings_bulk_result().
+                Defaults to False
+
+            Returns a dictionary with:
+            - picking_ids: Array (int), the id of the picking created
+              for each spec or False
+            - errors: Array (string), the error of each spec or None
+            or, with use_jobs, a dictionary with:
+            - job_ids: Array (int), the jobs creating the pickings
+        """
+        Job = self.env['udes.job']
+
+        groups = self._partition_picking_specs(specs)
+        if use_jobs:
+            jobs = Job.browse()
+            for group in groups:
+                jobs |= Job.enqueue(
+                    self.browse(), '_create_pickings_group_job',
+                    [specs[index] for index in group], group,
+                    job_name=_('Create %s pickings') % len(group))
+            return {'job_ids': jobs.ids}
+
+        picking_ids = [False] * len(specs)
+        errors = [None] * len(specs)
+        for group in groups:
+            for index, (picking_id, error) in \
+                    self._create_pickings_group(specs, group).items():
+                picking_ids[index] = picking_id
+                errors[index] = error
+        return {'picking_ids': picking_ids, 'errors': errors}
+
+    @api.model
+    def get_pickings_bulk_result(self, job_ids):
+        """ Return the result of create_pickings_bulk with use_jobs from
+            the ids of its jobs, as a dictionary with:
+            - picking_ids: Array (int), the id of the picking created
+              for each spec or False
+            - errors: Array (string), the error of each spec or None
+            - pending: Array (int), the indexes of the specs of the jobs
+              not run yet
+        """
+        Job = self.env['udes.job']
+
+        jobs = Job.browse(job_ids)
+        indexes = {job: json.loads(job.args)[1] for job in jobs}
+        count = max([index + 1 for group in indexes.values()
+                     for index in group] or [0])
+        picking_ids = [False] * count
+        errors = [None] * count
+        pending = []
+        for job in jobs:
+            if job.state == 'done':
+                for index, picking_id, error in json.loads(job.result):
+                    picking_ids[index] = picking_id
+                    errors[index] = error
+            elif job.state == 'failed':
+                for index in indexes[job]:
+                    errors[index] = job.error
+            else:
+                pending.extend(indexes[job])
+        return {'picking_ids': picking_ids, 'errors': errors,
+                'pending': sorted(pending)}
+
+    @serialized_update
+    @instrumented
+    @idempotent
     def update_picking(
             self,
             quant_ids=None,
@@ -248,6 +503,7 @@ class StockPicking(models.Model):
             package_name=None,
             move_parent_package=False,
             products_info=None,
+            validate_async=False,
     ):
         """ Update/mutate the stock picking in self
 
@@ -280,10 +536,21 @@ class StockPicking(models.Model):
                 An array with the products information to be marked as done,
                 where each dictionary contains: product_barcode, qty and
                 serial numbers if needed
+            @param (optional) validate_async: Boolean
+                When validating, enqueue the validation of the transfer
+                as a udes.job and return the information of the job
+                instead of waiting for it. Its status can be polled with
+                udes.job get_info().
+                Defaults to False
+            @param (optional) idempotency_key: string
+                Key generated by the client for this request, retries
+                with the same key return the stored result of the first
+                call instead of updating the picking again.
 
         """
         Location = self.env['stock.location']
         Package = self.env['stock.quant.package']
+        Job = self.env['udes.job']
 
         self.assert_valid_state()
 
@@ -292,7 +559,8 @@ class StockPicking(models.Model):
         if quant_ids:
             # Create extra stock.moves to the picking
             self._create_moves_from_quants(quant_ids, confirm=True, assign=True,
-                                           result_package=result_package_name)
+                                           result_package=result_package_name,
+                                           move_parent_package=move_parent_package)
             # when adding only do this?
             return True
 
@@ -300,11 +568,6 @@ class StockPicking(models.Model):
             values['location_dest'] = location_dest_id or location_dest_barcode or location_dest_name
         if result_package_name:
             values['result_package'] = result_package_name
-        if not move_parent_package:
-            # not needed yet, move it outside udes_core
-            # when false remove parent_id of the result_package_id ??
-            #picking.move_line_ids.mapped('result_package_id').write({'package_id': False})
-            pass
 
         # get all the stock.move.lines
         move_lines = self.move_line_ids
@@ -328,9 +591,15 @@ class StockPicking(models.Model):
                         _('Cannot validate transfer because there'
                           ' are move lines todo'))
             # by default action_done will backorder the stock.move.lines todo
+            if validate_async:
+                job = Job.enqueue(self, '_action_done_locked',
+                                  job_name=_('Validate %s') % self.name)
+                return job.get_info()[0]
             # validate stock.picking
             self.action_done() # old do_transfer
 
+    @read_replica
+    @instrumented
     def get_pickings(self,
                      origin=None,
                      package_name=None,
@@ -412,6 +681,7 @@ class StockPicking(models.Model):
         Picking = self.env['stock.picking']
         Package = self.env['stock.quant.package']
         Users = self.env['res.users']
+        SlowQuery = self.env['udes.slow.query']
 
         order = None
 
@@ -475,10 +745,109 @@ class StockPicking(models.Model):
         if extra_domain:
             domain.extend(extra_domain)
 
+        start = time.time()
         pickings = Picking.search(domain, order=order)
+        SlowQuery.log_slow_search('stock.picking.get_pickings', Picking,
+                                  domain, time.time() - start, order=order)
 
         return pickings
 
+    def _get_changed(self, model, cursor, picking_type_ids=None):
+        """ Return the records of model in the picking types in
+            picking_type_ids (all when None) changed by transactions since
+            cursor, or not done nor cancelled when cursor is None.
+        """
+        Model = self.env[model]
+        if model == 'stock.move.line':
+            picking_type_field = 'picking_id.picking_type_id'
+        else:
+            picking_type_field = 'picking_type_id'
+        domain = []
+        if picking_type_ids is not None:
+            domain.append((picking_type_field, 'in', picking_type_ids))
+        if cursor is None:
+            return Model.search(domain + [('state', 'not in',
+                                           ('done', 'cancel'))])
+        self.env.cr.execute(
+            'SELECT id FROM {} WHERE u_sync_txid >= %s'.format(Model._table),
+            (cursor,))
+        ids = [id_ for id_, in self.env.cr.fetchall()]
+        if not ids:
+            return Model
+        return Model.search(domain + [('id', 'in', ids)])
+
+    @instrumented
+    def get_changes(self, cursor=None, picking_type_ids=None):
+        """ Return the pickings, moves and move lines created, modified
+            or removed since cursor, to keep a list of pickings up to date
+            without fetching it again.
+
+            @param (optional) cursor: string
+                Cursor returned by the previous call. When it is not set,
+                the pickings, moves and move lines that are not done nor
+                cancelled are returned.
+            @param (optional) picking_type_ids: Array (int)
+                If it is set only the changes of these picking types are
+                returned.
+
+            Changes committed while the previous call was running are
+            returned again, so records may be received more than once.
+            Returns a dictionary with keys:
+            - cursor: string, to pass to the next call
+            - reset: Boolean, True when the cursor is too old to know
+              what has been removed since; the result is then the
+              complete list, as if no cursor had been given
+            - pickings: [{stock.picking}] without their moves
+            - moves: [{stock.move}] with picking_id
+            - move_lines: [{stock.move.line}] with move_id and picking_id
+            - removed: dictionary mapping stock.picking, stock.move and
+              stock.move.line to the ids of the records removed
+        """
+        Tombstone = self.env['udes.sync.tombstone']
+
+        # read the new cursor first, changes committed while this call
+        # runs are returned again by the next one
+        new_cursor = Tombstone.get_current_cursor()
+        reset = False
+        if cursor is not None:
+            try:
+                cursor = int(cursor)
+            except ValueError:
+                raise ValidationError(_('Invalid cursor %s') % cursor)
+            if cursor < Tombstone.get_min_cursor():
+                cursor = None
+                reset = True
+
+        pickings = self._get_changed('stock.picking', cursor,
+                                     picking_type_ids)
+        moves = self._get_changed('stock.move', cursor, picking_type_ids)
+        move_lines = self._get_changed('stock.move.line', cursor,
+                                       picking_type_ids)
+        if cursor is None:
+            removed = {'stock.picking': [], 'stock.move': [],
+                       'stock.move.line': []}
+        else:
+            removed = Tombstone.get_removed(cursor, picking_type_ids)
+
+        picking_fields = ['id', 'name', 'priority', 'backorder_id',
+                          'priority_name', 'origin', 'state',
+                          'location_dest_id', 'picking_type_id']
+        # the information has to be read from the same database as the
+        # cursor
+        pickings = pickings.with_context(udes_no_replica=True)
+        return {
+            'cursor': str(new_cursor),
+            'reset': reset,
+            'pickings': pickings.get_info(fields_to_fetch=picking_fields),
+            'moves': [dict(info, picking_id=move.picking_id.id)
+                      for move, info in zip(moves, moves.get_info())],
+            'move_lines': [dict(info, move_id=line.move_id.id,
+                                picking_id=line.picking_id.id)
+                           for line, info in zip(move_lines,
+                                                 move_lines.get_info())],
+            'removed': removed,
+        }
+
     def _get_package_search_domain(self, package):
         """ Generate the domain for searching pickings of a package
         """
@@ -522,6 +891,8 @@ class StockPicking(models.Model):
 
         return {key: value(self) for key, value in info.items() if key in fields_to_fetch}
 
+    @read_replica
+    @instrumented
     def get_info(self, **kwargs):
         """ Return a list with the information of each picking in self.
         """
@@ -1,31 +1,78 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, _
+from psycopg2 import OperationalError, errorcodes
+
+from odoo import api, models, _
 from odoo.exceptions import ValidationError
+from odoo.osv import expression
 
 class StockQuant(models.Model):
     _inherit = 'stock.quant'
 
+    def _lock_for_update(self):
+        """ Lock the quants in self until the end of the transaction.
+            Fail immediately when another transaction is using any of
+            them instead of waiting for it.
+        """
+        if not self:
+            return
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute("""
+                    SELECT id FROM stock_quant
+                    WHERE id = ANY(%s)
+                    FOR UPDATE NOWAIT
+                """, (self.ids,), log_exceptions=False)
+        except OperationalError as e:
+            if e.pgcode != errorcodes.LOCK_NOT_AVAILABLE:
+                raise
+            raise ValidationError(_('Items are in use by another operation '
+                                    'and cannot be moved. Please try again '
+                                    'later.'))
+
     def assert_not_reserved(self):
         """Ensure all quants in the recordset are unreserved."""
-        reserved = self.filtered(lambda q: q.reserved_quantity > 0)
-        if reserved:
+        Package = self.env['stock.quant.package']
+        Product = self.env['product.product']
+
+        if not self:
+            return
+        # only fetch the packages and products of the reserved quants
+        self.env.cr.execute("""
+            SELECT array_agg(DISTINCT package_id)
+                       FILTER (WHERE package_id IS NOT NULL),
+                   array_agg(DISTINCT product_id)
+            FROM stock_quant
+            WHERE id = ANY(%s) AND reserved_quantity > 0
+        """, (self.ids,))
+        package_ids, product_ids = self.env.cr.fetchone()
+        if product_ids:
             raise ValidationError(_('Items are reserved and cannot be moved. '
                                     'Please speak to a team leader to resolve '
                                     'the issue.\nAffected Items: %s') % (
-                                        ' '.join(reserved.mapped('package_id.name'))
-                                        if reserved.mapped('package_id')
-                                        else ' '.join(reserved.mapped('product_id.display_name'))))
+                                        ' '.join(Package.browse(package_ids).mapped('name'))
+                                        if package_ids
+                                        else ' '.join(Product.browse(product_ids).mapped('display_name'))))
 
     def assert_entire_packages(self):
         """Ensure the recordset self contains all the quants in package present
         in the recordset."""
-        packages = self.mapped('package_id')
-        package_quant_ids = packages.mapped('quant_ids')
+        Package = self.env['stock.quant.package']
 
-        diff = package_quant_ids - self
-        if diff:
-            prob_packs = diff.mapped('package_id')
+        if not self:
+            return
+        # packages of the quants in self with quants that are not in self
+        self.env.cr.execute("""
+            SELECT DISTINCT q.package_id
+            FROM stock_quant q
+            WHERE q.package_id IN (
+                    SELECT package_id FROM stock_quant WHERE id = ANY(%s)
+                  )
+              AND NOT q.id = ANY(%s)
+        """, (self.ids, self.ids))
+        prob_pack_ids = [package_id for package_id, in self.env.cr.fetchall()]
+        if prob_pack_ids:
+            prob_packs = Package.browse(prob_pack_ids)
             raise ValidationError(_('Not all quants have been taken.\n'
                                     'Incomplete Packages:\n'
                                     '%s') % (' '.join(prob_packs.mapped('name'))))
@@ -35,43 +82,118 @@ class StockQuant(models.Model):
         """
         # TODO: check this function again, create generic is_valid/are_valid?
         Location = self.env['stock.location']
-        n_quant_locs = len(self.mapped('location_id'))
-        child_locs = Location.search([
-                ('id', 'child_of', location_id),
-                ('id', 'in', self.mapped('location_id.id'))
-            ])
-        if len(child_locs) != n_quant_locs:
+        quant_locations = self.mapped('location_id')
+        child_locs = quant_locations.filter_children_of(location_id)
+        if len(child_locs) != len(quant_locations):
             raise ValidationError(
                     _('The locations of some quants are not children of'
                       ' location %s') %
                         Location.browse(location_id).name)
 
+    @api.model
+    def _search(self, args, offset=0, limit=None, order=None, count=False,
+                access_rights_uid=None):
+        """ Restrict the search to the quants in context variable
+            udes_gather_quant_ids when it is set by _gather().
+        """
+        gather_quant_ids = self.env.context.get('udes_gather_quant_ids')
+        if gather_quant_ids is not None:
+            args = expression.AND([args, [('id', 'in', gather_quant_ids)]])
+        return super(StockQuant, self)._search(
+            args, offset=offset, limit=limit, order=order, count=count,
+            access_rights_uid=access_rights_uid)
+
     def _gather(self, product_id, location_id, **kwargs):
         """ Call default _gather function, if quant_ids context variable
-            is set the resulting quants are filtered by id.
+            is set the quants are filtered by id in the search done by
+            _gather, so only the requested quants are loaded.
 
             Context variable quant_ids might contain quants of different products.
         """
-        quants = super(StockQuant, self)._gather(product_id, location_id, **kwargs)
         quant_ids = self.env.context.get('quant_ids')
+        Quant = self
         if quant_ids:
-            quants = quants.filtered(lambda q: q.id in quant_ids)
-        return quants
+            if isinstance(quant_ids, models.BaseModel):
+                quant_ids = quant_ids.ids
+            Quant = self.with_context(udes_gather_quant_ids=list(set(quant_ids)))
+        quants = super(StockQuant, Quant)._gather(product_id, location_id, **kwargs)
+        # do not propagate udes_gather_quant_ids to other searches
+        return quants.with_env(self.env)
+
+    def _with_parent_packages(self):
+        """ Returns the quants in self plus all the quants contained in
+            the root packages (i.e., pallets) of the packages of the
+            quants in self.
+        """
+        pallets = self.mapped('package_id').get_root_package()
+        return self | pallets.get_all_contained_quants()
+
+    def aggregate_quantities(self, groupby=('product_id',), domain=None):
+        """ Returns the total quantity and reserved quantity of the quants
+            in self grouped by the fields in groupby, computed in SQL.
+            When domain is set the quants matching domain are aggregated,
+            restricted to the quants in self if self is not empty.
+
+            @param groupby: list (string)
+                Any of product_id, lot_id, package_id, location_id and
+                owner_id. Defaults to product_id.
+            @param (optional) domain
+                Domain of the quants to aggregate.
+
+            The result is a dictionary mapped by tuples with the ids
+            of the groupby fields (False when not set), where the values
+            are dictionaries with keys quantity and reserved_quantity.
+        """
+        groupby = list(groupby)
+        invalid = set(groupby) - {'product_id', 'lot_id', 'package_id',
+                                  'location_id', 'owner_id'}
+        if invalid:
+            raise ValidationError(
+                    _('Cannot group quant quantities by %s') %
+                    ', '.join(sorted(invalid)))
+
+        if domain is None:
+            domain = [('id', 'in', self.ids)]
+        elif self:
+            domain = expression.AND([domain, [('id', 'in', self.ids)]])
+        query = self._where_calc(domain)
+        self._apply_ir_rules(query, 'read')
+        from_clause, where_clause, params = query.get_sql()
+
+        columns = ['"stock_quant"."%s"' % field for field in groupby]
+        self.env.cr.execute("""
+            SELECT {select}
+                   SUM("stock_quant".quantity),
+                   SUM("stock_quant".reserved_quantity)
+            FROM {from_clause}
+            WHERE {where_clause}
+            {groupby}
+        """.format(select=''.join(col + ', ' for col in columns),
+                   from_clause=from_clause,
+                   where_clause=where_clause or 'TRUE',
+                   groupby='GROUP BY ' + ', '.join(columns) if columns else ''),
+            params)
+
+        res = {}
+        for row in self.env.cr.fetchall():
+            key = tuple(id_ or False for id_ in row[:-2])
+            quantity, reserved_quantity = row[-2:]
+            res[key] = {'quantity': quantity or 0.0,
+                        'reserved_quantity': reserved_quantity or 0.0}
+        return res
 
     def total_quantity(self):
         """ Returns the total quantity of the quants in self
         """
-        return sum(self.mapped('quantity'))
+        return self.aggregate_quantities(groupby=())[()]['quantity']
 
     def group_quantity_by_product(self):
         """ Returns a dictionary with the total quantity per product,
             mapped by product_id.
         """
-        products = {}
-        for quant in self:
-            products.setdefault(quant.product_id.id, 0)
-            products[quant.product_id.id] += quant.quantity
-        return products
+        return {product_id: values['quantity']
+                for (product_id,), values
+                in self.aggregate_quantities(groupby=('product_id',)).items()}
 
     def _prepare_info(self):
         """
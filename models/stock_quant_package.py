@@ -1,12 +1,56 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, _
+import hashlib
+
+from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
+from odoo.tools.float_utils import float_repr
+
+from ..instrumentation import instrumented
 
 
 class StockQuantPackage(models.Model):
     _inherit = "stock.quant.package"
 
+    u_content_hash = fields.Char('Content Hash',
+                                 compute='_compute_content_hash',
+                                 store=True, index=True, readonly=True,
+                                 help='Hash of the products and quantities '
+                                      'in the package, packages with the '
+                                      'same content have the same hash')
+
+    # nested packages, i.e., pallets containing packages
+    u_parent_package_id = fields.Many2one(
+        'stock.quant.package', 'Parent Package', index=True,
+        ondelete='restrict', help='Package containing this package')
+    u_children_package_ids = fields.One2many(
+        'stock.quant.package', 'u_parent_package_id', 'Contained Packages')
+
+    @api.constrains('u_parent_package_id')
+    def _check_package_recursion(self):
+        if not self._check_recursion(parent='u_parent_package_id'):
+            raise ValidationError(_('A package cannot contain itself.'))
+
+    @api.depends('quant_ids.product_id', 'quant_ids.quantity')
+    def _compute_content_hash(self):
+        Quant = self.env['stock.quant'].sudo()
+        DecimalPrecision = self.env['decimal.precision']
+
+        precision = DecimalPrecision.precision_get('Product Unit of Measure')
+        contents = {}
+        # read the content of all the packages with one query
+        quantities = Quant.aggregate_quantities(
+            groupby=('package_id', 'product_id'),
+            domain=[('package_id', 'in', self.ids)])
+        for (package_id, product_id), values in sorted(quantities.items()):
+            contents.setdefault(package_id, []).append('{}:{}'.format(
+                product_id, float_repr(values['quantity'], precision)))
+
+        for package in self:
+            content = contents.get(package.id)
+            package.u_content_hash = content and \
+                hashlib.sha1(';'.join(content).encode()).hexdigest()
+
     def _prepare_info(self, extended=False):
         """
             Prepares the following info of the package in self:
@@ -36,6 +80,7 @@ class StockQuantPackage(models.Model):
 
         return res
 
+    @instrumented
     def get_package(self, package_identifier, create=False, no_results=False):
         """ Get package from a name (i.e., barcode) or id.
 
@@ -77,5 +122,71 @@ class StockQuantPackage(models.Model):
         """ Compare the content of current package with the content of another package.
         """
         self.ensure_one()
-        return frozenset(self._get_all_products_quantities().items()) == \
-               frozenset(other._get_all_products_quantities().items())
+        return self.u_content_hash == other.u_content_hash
+
+    def get_packages_with_same_content(self):
+        """ Return the other packages with the same content as the package
+            in self. Empty packages have no content to share, so none is
+            returned for them.
+        """
+        self.ensure_one()
+        if not self.u_content_hash:
+            return self.browse()
+        return self.search([('u_content_hash', '=', self.u_content_hash),
+                            ('id', '!=', self.id)])
+
+    def get_all_descendants(self):
+        """ Return all the packages contained in the packages in self at
+            any depth, using a single recursive query.
+        """
+        self.env.cr.execute("""
+            WITH RECURSIVE descendants(id) AS (
+                SELECT id FROM stock_quant_package
+                WHERE u_parent_package_id = ANY(%s)
+                UNION
+                SELECT p.id
+                FROM stock_quant_package p
+                JOIN descendants d ON p.u_parent_package_id = d.id
+            )
+            SELECT id FROM descendants
+        """, (self.ids,))
+        return self.browse([id_ for id_, in self.env.cr.fetchall()])
+
+    def get_all_contained_quants(self):
+        """ Return the quants in the packages in self and in all the
+            packages they contain, using a single recursive query.
+        """
+        Quant = self.env['stock.quant']
+
+        self.env.cr.execute("""
+            WITH RECURSIVE tree(id) AS (
+                SELECT unnest(%s::integer[])
+                UNION
+                SELECT p.id
+                FROM stock_quant_package p
+                JOIN tree t ON p.u_parent_package_id = t.id
+            )
+            SELECT q.id
+            FROM stock_quant q
+            JOIN tree t ON q.package_id = t.id
+        """, (self.ids,))
+        return Quant.browse([id_ for id_, in self.env.cr.fetchall()])
+
+    def get_root_package(self):
+        """ Return the outermost packages (i.e., pallets) containing the
+            packages in self, using a single recursive query. Packages
+            not contained in another package are their own root.
+        """
+        self.env.cr.execute("""
+            WITH RECURSIVE ancestors(id, parent_id) AS (
+                SELECT id, u_parent_package_id
+                FROM stock_quant_package
+                WHERE id = ANY(%s)
+                UNION
+                SELECT p.id, p.u_parent_package_id
+                FROM stock_quant_package p
+                JOIN ancestors a ON p.id = a.parent_id
+            )
+            SELECT id FROM ancestors WHERE parent_id IS NULL
+        """, (self.ids,))
+        return self.browse([id_ for id_, in self.env.cr.fetchall()])
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models, _
+
+# records named in the aggregated message of a bulk archive
+MAX_NAMES_IN_MESSAGE = 20
+
+
+class UdesBulkArchiveMixin(models.AbstractModel):
+    _name = 'udes.bulk.archive.mixin'
+    _description = 'UDES Bulk Archive Mixin'
+
+    # methods that can be run by udes.job
+    _udes_job_methods = ('_track_active_change',)
+
+    def bulk_archive(self, defer_tracking=False):
+        """ Archive the records in self with a single update and a single
+            message instead of one message per record.
+
+            @param (optional) defer_tracking: Boolean
+                Track the change of each record in a background job.
+                Defaults to False
+
+            Returns the records archived, i.e., the ones that were active.
+        """
+        return self._bulk_set_active(False, defer_tracking=defer_tracking)
+
+    def bulk_unarchive(self, defer_tracking=False):
+        """ Unarchive the records in self with a single update and a
+            single message instead of one message per record.
+
+            @param (optional) defer_tracking: Boolean
+                Track the change of each record in a background job.
+                Defaults to False
+
+            Returns the records unarchived, i.e., the ones that were
+            archived.
+        """
+        return self._bulk_set_active(True, defer_tracking=defer_tracking)
+
+    def _bulk_set_active(self, active, defer_tracking=False):
+        """ Set active of the records in self in one statement, post the
+            aggregated message and return the records changed.
+        """
+        Job = self.env['udes.job']
+
+        self.check_access_rights('write')
+        self.check_access_rule('write')
+        if not self:
+            return self
+
+        self.env.cr.execute("""
+            UPDATE {table}
+            SET active = %s,
+                write_uid = %s,
+                write_date = now() at time zone 'UTC'
+            WHERE id = ANY(%s) AND active IS DISTINCT FROM %s
+            RETURNING id
+        """.format(table=self._table),
+            (active, self.env.uid, self.ids, active))
+        changed = self.browse([id_ for id_, in self.env.cr.fetchall()])
+        if not changed:
+            return changed
+
+        self.invalidate_cache(['active', 'write_uid', 'write_date'],
+                              changed.ids)
+        changed.modified(['active'])
+        changed.recompute()
+
+        self._get_bulk_archive_thread(changed).message_post(
+            body=self._bulk_archive_message(changed, active))
+        if defer_tracking:
+            Job.enqueue(changed, '_track_active_change', not active,
+                        job_name=_('Track archiving of %s %s') %
+                        (len(changed), self._description))
+        return changed
+
+    def _get_bulk_archive_thread(self, records):
+        """ Return the record the aggregated message of a bulk archive of
+            records is posted on, the first of them by default.
+        """
+        return records[0]
+
+    @api.model
+    def _bulk_archive_message(self, records, active):
+        """ Return the aggregated message of a bulk archive of records
+        """
+        names = [name for _id, name
+                 in records[:MAX_NAMES_IN_MESSAGE].name_get()]
+        if len(records) > MAX_NAMES_IN_MESSAGE:
+            names.append(_('and %s more') %
+                         (len(records) - MAX_NAMES_IN_MESSAGE))
+        if active:
+            message = _('%s %s unarchived: %s')
+        else:
+            message = _('%s %s archived: %s')
+        return message % (len(records), self._description, ', '.join(names))
+
+    def _track_active_change(self, old_active):
+        """ Track the change of active of each record in self, from
+            old_active to its current value.
+        """
+        tracked_fields = self._get_tracked_fields(['active'])
+        self.message_track(tracked_fields,
+                           {record.id: {'active': old_active}
+                            for record in self})
+        return True
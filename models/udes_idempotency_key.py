@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from odoo import api, fields, models, _
+from odoo.exceptions import ValidationError
+
+from ..common import serialize_result, deserialize_result
+
+
+class UdesIdempotencyKey(models.Model):
+    _name = 'udes.idempotency.key'
+    _description = 'UDES Idempotency Key'
+
+    key = fields.Char('Key', required=True, readonly=True)
+    method = fields.Char('Method', required=True, readonly=True)
+    user_id = fields.Many2one('res.users', 'User', required=True,
+                              readonly=True)
+    res_ids = fields.Text('Record IDs', default='[]', readonly=True,
+                          help='JSON list of ids of the records the method '
+                               'is called on')
+    args_hash = fields.Char('Arguments Hash', readonly=True,
+                            help='SHA-1 of the arguments of the call')
+    result = fields.Text('Result', readonly=True,
+                         help='JSON encoded value returned by the method')
+    expiry_date = fields.Datetime('Expiry Date', required=True, index=True,
+                                  readonly=True)
+
+    _sql_constraints = [
+        ('key_uniq', 'unique(key)', 'The idempotency key must be unique.'),
+    ]
+
+    def _get_ttl(self):
+        """ Hours the results are kept, from the system parameter
+            udes_core.idempotency_key_ttl (24 by default)
+        """
+        Config = self.env['ir.config_parameter'].sudo()
+        return int(Config.get_param('udes_core.idempotency_key_ttl', 24))
+
+    def _get_args_hash(self, args, kwargs):
+        """ Return the hash of the arguments of a call """
+        arguments = json.dumps([args, kwargs], sort_keys=True, default=str)
+        return hashlib.sha1(arguments.encode('utf-8')).hexdigest()
+
+    def _claim(self, key, method_name, res_ids, args_hash):
+        """ Insert key, or take it over when it has expired, and return its
+            id. When the key is already in use, return None; if the
+            transaction that inserted it is still running, wait until it
+            finishes.
+        """
+        expiry_date = datetime.utcnow() + timedelta(hours=self._get_ttl())
+        self.env.cr.execute("""
+            INSERT INTO udes_idempotency_key
+                (key, method, user_id, res_ids, args_hash, expiry_date,
+                 create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, %s, %s, %s, %s,
+                    %s, now() at time zone 'UTC',
+                    %s, now() at time zone 'UTC')
+            ON CONFLICT (key) DO UPDATE
+            SET method = EXCLUDED.method,
+                user_id = EXCLUDED.user_id,
+                res_ids = EXCLUDED.res_ids,
+                args_hash = EXCLUDED.args_hash,
+                result = NULL,
+                expiry_date = EXCLUDED.expiry_date,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            WHERE udes_idempotency_key.expiry_date < now() at time zone 'UTC'
+            RETURNING id
+        """, (key, method_name, self.env.uid, json.dumps(res_ids), args_hash,
+              fields.Datetime.to_string(expiry_date),
+              self.env.uid, self.env.uid))
+        row = self.env.cr.fetchone()
+        return row[0] if row else None
+
+    @api.model
+    def call(self, key, records, method, *args, **kwargs):
+        """ Call method on records and store its result under key, or
+            return the stored result if key has already been used for the
+            same call, i.e., same method, user, records and arguments.
+            Expired keys are used again.
+        """
+        method_name = '{}.{}'.format(records._name, method.__name__)
+        args_hash = self._get_args_hash(args, kwargs)
+        key_id = self._claim(key, method_name, records.ids, args_hash)
+        if key_id is None:
+            stored = self.sudo().search([('key', '=', key)])
+            if stored.method != method_name or \
+                    stored.user_id.id != self.env.uid or \
+                    json.loads(stored.res_ids) != records.ids or \
+                    stored.args_hash != args_hash:
+                raise ValidationError(
+                        _('Idempotency key %s has already been used for '
+                          'another operation') % key)
+            return deserialize_result(records.env, stored.result)
+
+        result = method(records, *args, **kwargs)
+        self.sudo().browse(key_id).write({'result': serialize_result(result)})
+        return result
+
+    @api.model
+    def _gc_expired_keys(self):
+        """ Remove the keys whose result has expired
+        """
+        self.env.cr.execute("""
+            DELETE FROM udes_idempotency_key
+            WHERE expiry_date < now() at time zone 'UTC'
+        """)
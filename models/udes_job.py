@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+
+from psycopg2 import OperationalError
+
+from odoo import api, fields, models, _
+from odoo.exceptions import ValidationError
+from odoo.service.model import PG_CONCURRENCY_ERRORS_TO_RETRY
+
+from ..common import serialize_result
+
+_logger = logging.getLogger(__name__)
+
+# times a job failing because of a concurrent transaction is run again
+MAX_CONCURRENCY_RETRIES = 5
+
+
+class UdesJob(models.Model):
+    _name = 'udes.job'
+    _description = 'UDES Job'
+    _order = 'id'
+
+    name = fields.Char('Name', required=True, readonly=True)
+    model_name = fields.Char('Model', required=True, readonly=True)
+    res_ids = fields.Text('Record IDs', default='[]', readonly=True,
+                          help='JSON list of ids of the records the method '
+                               'is called on')
+    method = fields.Char('Method', required=True, readonly=True)
+    args = fields.Text('Arguments', default='[]', readonly=True)
+    kwargs = fields.Text('Keyword Arguments', default='{}', readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='State', default='pending', required=True, index=True,
+        readonly=True)
+    result = fields.Text('Result', readonly=True,
+                         help='JSON encoded value returned by the method')
+    error = fields.Text('Error', readonly=True)
+    date_done = fields.Datetime('Date Done', readonly=True)
+    attempts = fields.Integer('Attempts', default=0, readonly=True,
+                              help='Number of times the job has been '
+                                   'retried after a concurrency error')
+    date_next_attempt = fields.Datetime(
+        'Next Attempt', readonly=True,
+        help='The job is not run again before this date after a '
+             'concurrency error')
+    user_id = fields.Many2one('res.users', 'User', required=True,
+                              readonly=True,
+                              help='User the method is executed as')
+
+    @api.model
+    def _check_method(self, records, method):
+        """ Raise an error unless method is in the _udes_job_methods of the
+            model of records, the methods that can be run as jobs.
+        """
+        if method not in getattr(records, '_udes_job_methods', ()):
+            raise ValidationError(
+                    _('Method %s of %s cannot be run as a job') %
+                    (method, records._name))
+
+    @api.model
+    def enqueue(self, records, method, *args, **kwargs):
+        """ Create a pending job that will call method on records with
+            args and kwargs, as the current user.
+
+            The method has to be in the _udes_job_methods of the model of
+            records and the arguments have to be JSON serializable.
+        """
+        self._check_method(records, method)
+        name = kwargs.pop('job_name', None) or '{}.{}'.format(records._name,
+                                                               method)
+        # jobs are only created by the server, users can only read them
+        return self.sudo().create({
+            'name': name,
+            'model_name': records._name,
+            'res_ids': json.dumps(records.ids),
+            'method': method,
+            'args': json.dumps(args),
+            'kwargs': json.dumps(kwargs),
+            'user_id': self.env.uid,
+        }).sudo(self.env.uid)
+
+    def _run(self):
+        """ Call the method of the job in self and return its encoded
+            result.
+        """
+        self.ensure_one()
+        records = self.env[self.model_name].sudo(self.user_id.id).browse(
+            json.loads(self.res_ids))
+        self._check_method(records, self.method)
+        result = getattr(records, self.method)(*json.loads(self.args),
+                                               **json.loads(self.kwargs))
+        return serialize_result(result)
+
+    def run_job(self):
+        """ Run the pending job in self in the current transaction.
+
+            Errors do not propagate, the changes of the job are rolled
+            back and the job is marked as failed. Serialization failures
+            and deadlocks leave the job pending, to be retried by a later
+            pass of _process_jobs() after a jittered backoff, up to
+            MAX_CONCURRENCY_RETRIES times.
+        """
+        self.ensure_one()
+        if self.state != 'pending':
+            raise ValidationError(
+                    _('Job %s cannot be run, it is %s') %
+                    (self.id, self.state))
+        try:
+            with self.env.cr.savepoint():
+                result = self._run()
+        except Exception as e:
+            if isinstance(e, OperationalError) and \
+                    e.pgcode in PG_CONCURRENCY_ERRORS_TO_RETRY and \
+                    self.attempts < MAX_CONCURRENCY_RETRIES:
+                _logger.info('Job %s (%s) will be retried: %s',
+                             self.id, self.name, e.pgcode)
+                self._retry_later()
+                return
+            _logger.exception('Job %s (%s) failed', self.id, self.name)
+            self.sudo().write({
+                'state': 'failed',
+                'error': getattr(e, 'name', None) or str(e),
+                'date_done': fields.Datetime.now(),
+            })
+        else:
+            self.sudo().write({
+                'state': 'done',
+                'result': result,
+                'date_done': fields.Datetime.now(),
+            })
+
+    def _retry_later(self):
+        """ Count an attempt of the job in self and set the date it can
+            be run again, after a jittered exponential backoff, instead
+            of waiting while holding the job and the transaction.
+        """
+        self.ensure_one()
+        # at least a second, the date is stored to the second
+        delay = random.uniform(1.0, 2.0 ** (self.attempts + 1))
+        self.sudo().write({
+            'attempts': self.attempts + 1,
+            'date_next_attempt': fields.Datetime.to_string(
+                datetime.utcnow() + timedelta(seconds=delay)),
+        })
+
+    def _acquire_pending_job(self):
+        """ Lock and return the oldest pending job that is due, i.e., not
+            waiting to be retried, and not locked by any other transaction.
+        """
+        self.env.cr.execute("""
+            SELECT id FROM udes_job
+            WHERE state = 'pending'
+              AND (date_next_attempt IS NULL
+                   OR date_next_attempt <= now() at time zone 'UTC')
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """)
+        row = self.env.cr.fetchone()
+        return self.browse(row[0] if row else [])
+
+    @api.model
+    def _process_jobs(self, limit=None):
+        """ Run the pending jobs that are due until there are none left or
+            limit jobs have been run. Each job runs and is committed in its own
+            transaction, so several workers can process the queue at the
+            same time.
+        """
+        processed = 0
+        while limit is None or processed < limit:
+            with self.pool.cursor() as cr:
+                job = self.with_env(self.env(cr=cr))._acquire_pending_job()
+                if not job:
+                    break
+                job.run_job()
+            processed += 1
+        return processed
+
+    def _prepare_info(self):
+        """
+            Prepares the following info of the job in self:
+            - id: int
+            - name: string
+            - state: string
+            - result: decoded value returned by the method
+            - error: string
+        """
+        self.ensure_one()
+
+        return {'id': self.id,
+                'name': self.name,
+                'state': self.state,
+                'result': json.loads(self.result) if self.result else None,
+                'error': self.error,
+                }
+
+    def get_info(self):
+        """ Return a list with the information of each job in self.
+        """
+        res = []
+        for job in self:
+            res.append(job._prepare_info())
+
+        return res
+
+    def get_job(self, job_id):
+        """ Get job from id
+        """
+        job = self.browse(job_id)
+        if not job.exists():
+            raise ValidationError(
+                    _('Cannot find job with id %s') % job_id)
+        return job
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models, _
+from odoo.exceptions import ValidationError
+
+from ..instrumentation import instrumented
+from ..replica import read_replica
+
+# For each model indexed, the SQL selecting its identifiers as
+# (value, res_id, kind), restricted to the ids in the ids array or all
+# records when it is null
+IDENTIFIER_SOURCES = {
+    'stock.location': """
+        SELECT v.value, l.id, 'location'
+        FROM stock_location l
+        CROSS JOIN LATERAL (VALUES (l.barcode), (l.name)) v(value)
+        WHERE (ids IS NULL OR l.id = ANY(ids))
+          AND l.active AND v.value IS NOT NULL
+    """,
+    'product.product': """
+        SELECT v.value, p.id, 'product'
+        FROM product_product p
+        JOIN product_template t ON t.id = p.product_tmpl_id
+        CROSS JOIN LATERAL (VALUES (p.barcode), (t.name)) v(value)
+        WHERE (ids IS NULL OR p.id = ANY(ids))
+          AND p.active AND v.value IS NOT NULL
+    """,
+    'stock.quant.package': """
+        SELECT p.name, p.id, 'package'
+        FROM stock_quant_package p
+        WHERE (ids IS NULL OR p.id = ANY(ids)) AND p.name IS NOT NULL
+    """,
+    'stock.production.lot': """
+        SELECT l.name, l.id,
+               CASE WHEN t.tracking = 'serial' THEN 'serial' ELSE 'lot' END
+        FROM stock_production_lot l
+        JOIN product_product p ON p.id = l.product_id
+        JOIN product_template t ON t.id = p.product_tmpl_id
+        WHERE (ids IS NULL OR l.id = ANY(ids)) AND l.name IS NOT NULL
+    """,
+    'stock.picking': """
+        SELECT p.name, p.id, 'picking'
+        FROM stock_picking p
+        WHERE (ids IS NULL OR p.id = ANY(ids)) AND p.name IS NOT NULL
+    """,
+}
+
+# For each table, the columns that change the identifiers, and the model
+# and ids (in terms of the row changed, rec) of the identifiers to refresh
+IDENTIFIER_TRIGGERS = {
+    'stock_location': ('barcode, name, active',
+                       'stock.location', 'ARRAY[rec.id]'),
+    'product_product': ('barcode, active, product_tmpl_id',
+                        'product.product', 'ARRAY[rec.id]'),
+    'product_template': ('name', 'product.product',
+                         'ARRAY(SELECT id FROM product_product '
+                         'WHERE product_tmpl_id = rec.id)'),
+    'stock_quant_package': ('name', 'stock.quant.package', 'ARRAY[rec.id]'),
+    'stock_production_lot': ('name, product_id', 'stock.production.lot',
+                             'ARRAY[rec.id]'),
+    'stock_picking': ('name', 'stock.picking', 'ARRAY[rec.id]'),
+}
+
+
+def _function_name(name):
+    return 'udes_scan_identifier_{}'.format(name.replace('.', '_'))
+
+
+class UdesScanIdentifier(models.Model):
+    _name = 'udes.scan.identifier'
+    _description = 'UDES Scan Identifier'
+    _log_access = False
+
+    value = fields.Char('Value', required=True, index=True, readonly=True)
+    res_model = fields.Char('Model', required=True, readonly=True)
+    res_id = fields.Integer('Record ID', required=True, readonly=True)
+    kind = fields.Selection([
+        ('location', 'Location'),
+        ('product', 'Product'),
+        ('package', 'Package'),
+        ('lot', 'Lot'),
+        ('serial', 'Serial Number'),
+        ('picking', 'Picking'),
+    ], string='Kind', required=True, readonly=True)
+
+    @api.model_cr
+    def init(self):
+        """ Create the functions refreshing the identifiers of each model
+            and the triggers calling them on every change of the
+            identifiers, and index all the records when the table is
+            empty.
+        """
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS udes_scan_identifier_res_idx
+            ON udes_scan_identifier (res_model, res_id)
+        """)
+        for model, source in IDENTIFIER_SOURCES.items():
+            self.env.cr.execute("""
+                CREATE OR REPLACE FUNCTION {function}(ids integer[])
+                RETURNS void AS $$
+                BEGIN
+                    DELETE FROM udes_scan_identifier
+                    WHERE res_model = '{model}'
+                      AND (ids IS NULL OR res_id = ANY(ids));
+                    INSERT INTO udes_scan_identifier
+                        (value, res_id, kind, res_model)
+                    SELECT DISTINCT source.*, '{model}'
+                    FROM ({source}) source;
+                END;
+                $$ LANGUAGE plpgsql;
+            """.format(function=_function_name(model), model=model,
+                       source=source))
+        for table, (columns, model, ids) in IDENTIFIER_TRIGGERS.items():
+            self.env.cr.execute("""
+                CREATE OR REPLACE FUNCTION {function}()
+                RETURNS trigger AS $$
+                DECLARE
+                    rec RECORD;
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN
+                        rec := OLD;
+                    ELSE
+                        rec := NEW;
+                    END IF;
+                    PERFORM {refresh}({ids});
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                DROP TRIGGER IF EXISTS {function}_trigger ON {table};
+                CREATE TRIGGER {function}_trigger
+                AFTER INSERT OR DELETE OR UPDATE OF {columns}
+                ON {table}
+                FOR EACH ROW EXECUTE PROCEDURE {function}();
+            """.format(function=_function_name(table), table=table,
+                       columns=columns, refresh=_function_name(model),
+                       ids=ids))
+        self.env.cr.execute("SELECT 1 FROM udes_scan_identifier LIMIT 1")
+        if not self.env.cr.fetchone():
+            self._rebuild()
+
+    @api.model
+    def _rebuild(self):
+        """ Index the identifiers of all the records
+        """
+        for model in IDENTIFIER_SOURCES:
+            self.env.cr.execute(
+                "SELECT {}(NULL)".format(_function_name(model)))
+        self.invalidate_cache()
+
+    @read_replica
+    @instrumented
+    @api.model
+    def resolve_scan(self, value):
+        """ Find the location, product, package, lot/serial number or
+            picking scanned from its barcode or name.
+
+            @param value: string
+                The value scanned.
+
+            Returns a dictionary with keys:
+            - kind: string, one of location, product, package, lot,
+              serial and picking
+            - model: string
+            - id: int
+            - info: information of the record as returned by its get_info,
+              or its id and name for models without get_info
+        """
+        self.env.cr.execute("""
+            SELECT DISTINCT res_model, res_id, kind
+            FROM udes_scan_identifier
+            WHERE value = %s
+        """, (value,))
+        matches = []
+        for res_model, res_id, kind in self.env.cr.fetchall():
+            # the identifiers do not apply record rules
+            record = self.env[res_model].search([('id', '=', res_id)])
+            if record:
+                matches.append((kind, record))
+
+        if not matches:
+            raise ValidationError(
+                    _('Nothing found for identifier %s') % value)
+        elif len(matches) > 1:
+            raise ValidationError(
+                    _('Too many records found for identifier %s: %s') %
+                    (value, ', '.join(sorted(kind for kind, _r in matches))))
+
+        kind, record = matches[0]
+        if hasattr(record, '_prepare_info'):
+            info = record.get_info()[0]
+        else:
+            info = {'id': record.id, 'name': record.display_name}
+        return {'kind': kind,
+                'model': record._name,
+                'id': record.id,
+                'info': info,
+                }
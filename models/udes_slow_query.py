@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+
+from ..replica import primary_env
+
+
+class UdesSlowQuery(models.Model):
+    _name = 'udes.slow.query'
+    _description = 'UDES Slow Query'
+    _order = 'id desc'
+
+    method = fields.Char('Method', required=True, readonly=True, index=True)
+    domain = fields.Text('Domain', readonly=True)
+    query = fields.Text('Query', readonly=True,
+                        help='SQL query with its parameters')
+    plan = fields.Text('Query Plan', readonly=True,
+                       help='Output of EXPLAIN (ANALYZE, BUFFERS)')
+    duration = fields.Float('Duration (s)', readonly=True, digits=(16, 6))
+    user_id = fields.Many2one('res.users', 'User', readonly=True)
+
+    def _get_threshold(self):
+        """ Seconds above which searches are logged, from the system
+            parameter udes_core.slow_query_threshold (1 by default,
+            negative to disable)
+        """
+        Config = self.env['ir.config_parameter'].sudo()
+        return float(Config.get_param('udes_core.slow_query_threshold', 1))
+
+    def _get_search_query(self, records, domain, order=None):
+        """ Return the SQL query and parameters executed by
+            records.search(domain, order=order)
+        """
+        query = records._where_calc(domain)
+        records._apply_ir_rules(query, 'read')
+        order_by = records._generate_order_by(order, query)
+        from_clause, where_clause, params = query.get_sql()
+        where_str = where_clause and (' WHERE %s' % where_clause) or ''
+        sql = 'SELECT "%s".id FROM ' % records._table + from_clause + \
+            where_str + order_by
+        return sql, params
+
+    @api.model
+    def log_slow_search(self, method, records, domain, duration, order=None):
+        """ When duration is above the threshold, log the domain of the
+            search done by method, the SQL query it generated and its
+            query plan.
+        """
+        threshold = self._get_threshold()
+        if threshold < 0 or duration < threshold:
+            return self.browse()
+
+        sql, params = self._get_search_query(records, domain, order=order)
+        with self.env.cr.savepoint():
+            self.env.cr.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql, params)
+            plan = '\n'.join(line for line, in self.env.cr.fetchall())
+        query = self.env.cr.mogrify(sql, params).decode()
+
+        # the search might have run on the read only database
+        SlowQuery = self.with_env(primary_env(self.env)).sudo()
+        return SlowQuery.create({
+            'method': method,
+            'domain': str(domain),
+            'query': query,
+            'plan': plan,
+            'duration': duration,
+            'user_id': self.env.uid,
+        })
@@ -0,0 +1,444 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+
+from odoo import api, models, _
+from odoo.exceptions import AccessError, ValidationError
+
+# columns accepted in the header of the imported file
+IMPORT_COLUMNS = ('location_barcode', 'product_barcode', 'quantity',
+                  'package_name', 'lot_name')
+REQUIRED_COLUMNS = ('location_barcode', 'product_barcode', 'quantity')
+
+
+class _CopyLines(object):
+    """ File object reading the lines of stream as the rows of a single
+        text column for COPY ... FROM STDIN, i.e., with the characters
+        special to its text format escaped.
+    """
+
+    def __init__(self, stream):
+        self._lines = iter(stream)
+        self._buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line.rstrip('\r\n').replace(
+                '\\', '\\\\').replace('\t', '\\t').replace(
+                '\r', '\\r') + '\n'
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _csv_patterns(delimiter):
+    """ Return the regular expressions (PostgreSQL) matching a row of
+        fields separated by delimiter, and a field preceded by delimiter,
+        in its first group. The fields of a row are the matches of the
+        row prefixed by delimiter, so none of them is empty.
+    """
+    delimiter = '\\' + delimiter
+    field = '"(?:[^"]|"")*"|[^"{}]*'.format(delimiter)
+    row = '^(?:{0})(?:{1}(?:{0}))*$'.format(field, delimiter)
+    return row, '{}({})'.format(delimiter, field)
+
+
+class UdesStockImport(models.AbstractModel):
+    _name = 'udes.stock.import'
+    _description = 'UDES Bulk Stock Import'
+
+    def _create_staging_table(self):
+        """ Create the temporary tables the rows are loaded into """
+        self.env.cr.execute("""
+            DROP TABLE IF EXISTS udes_import_raw, udes_import_row,
+                                 udes_import_quant;
+            CREATE TEMPORARY TABLE udes_import_raw (
+                line serial,
+                data text
+            ) ON COMMIT DROP;
+            CREATE TEMPORARY TABLE udes_import_row (
+                line integer,
+                location_barcode varchar,
+                product_barcode varchar,
+                quantity varchar,
+                package_name varchar,
+                lot_name varchar,
+                location_id integer,
+                company_id integer,
+                product_id integer,
+                product_uom_id integer,
+                tracking varchar,
+                package_id integer,
+                lot_id integer,
+                error varchar
+            ) ON COMMIT DROP;
+            CREATE TEMPORARY TABLE udes_import_quant (
+                id serial,
+                location_id integer,
+                company_id integer,
+                product_id integer,
+                product_uom_id integer,
+                package_name varchar,
+                package_id integer,
+                lot_name varchar,
+                lot_id integer,
+                quantity numeric,
+                lines integer[]
+            ) ON COMMIT DROP;
+        """)
+
+    def _copy_rows(self, data, delimiter):
+        """ Stream the lines of the CSV data into the staging table with
+            COPY, a line per row in a single text column, then split them
+            into the columns named in its header. A line that is not a
+            valid CSV row or does not have a field per column is rejected
+            instead of aborting the COPY. Fields cannot span lines.
+        """
+        if len(delimiter) != 1 or delimiter.isalnum() or \
+                delimiter in '"\r\n':
+            raise ValidationError(_('Invalid delimiter: %r') % delimiter)
+        stream = io.StringIO(data) if isinstance(data, str) else data
+        header = next(csv.reader([stream.readline()], delimiter=delimiter), [])
+        columns = [column.strip() for column in header]
+        unknown = set(columns) - set(IMPORT_COLUMNS)
+        missing = set(REQUIRED_COLUMNS) - set(columns)
+        if unknown or missing:
+            raise ValidationError(
+                    _('Invalid header, unknown columns: %s, missing '
+                      'columns: %s') % (', '.join(sorted(unknown)) or '-',
+                                        ', '.join(sorted(missing)) or '-'))
+        self.env.cr.copy_expert("COPY udes_import_raw (data) FROM STDIN",
+                                _CopyLines(stream))
+
+        row, field = _csv_patterns(delimiter)
+        self.env.cr.execute("""
+            INSERT INTO udes_import_row (line, {columns}, error)
+            SELECT r.line, {fields},
+                   CASE WHEN r.data !~ %(row)s THEN 'Malformed row'
+                        WHEN array_length(f.fields, 1) != %(count)s
+                        THEN 'Wrong number of columns'
+                   END
+            FROM udes_import_raw r
+            LEFT JOIN LATERAL (
+                SELECT array_agg(
+                           CASE WHEN m[1] LIKE '"%%'
+                                THEN replace(substr(m[1], 2,
+                                                    length(m[1]) - 2),
+                                             '""', '"')
+                                ELSE m[1]
+                           END ORDER BY n) AS fields
+                FROM regexp_matches(%(delimiter)s || r.data, %(field)s, 'g')
+                     WITH ORDINALITY AS m(m, n)
+            ) f ON r.data ~ %(row)s
+            WHERE r.data ~ '[^[:space:]]'
+        """.format(columns=', '.join(columns),
+                   fields=', '.join('f.fields[{}]'.format(i + 1)
+                                    for i in range(len(columns)))),
+            {'row': row, 'field': field, 'delimiter': delimiter,
+             'count': len(columns)})
+
+    def _resolve_rows(self):
+        """ Resolve locations and products by barcode, and reject the
+            invalid rows, with set based queries.
+        """
+        self.env.cr.execute("""
+            UPDATE udes_import_row
+            SET location_barcode = trim(location_barcode),
+                product_barcode = trim(product_barcode),
+                quantity = trim(quantity),
+                package_name = NULLIF(trim(package_name), ''),
+                lot_name = NULLIF(trim(lot_name), '');
+
+            UPDATE udes_import_row r
+            SET location_id = l.id, company_id = l.company_id
+            FROM stock_location l
+            WHERE l.barcode = r.location_barcode AND l.active;
+
+            UPDATE udes_import_row r
+            SET product_id = p.id,
+                product_uom_id = t.uom_id,
+                tracking = t.tracking
+            FROM product_product p
+            JOIN product_template t ON t.id = p.product_tmpl_id
+            WHERE p.barcode = r.product_barcode AND p.active;
+
+            UPDATE udes_import_row SET error = 'Invalid quantity'
+            WHERE error IS NULL AND (quantity IS NULL
+               OR quantity !~ '^[0-9]+(\\.[0-9]+)?$');
+            UPDATE udes_import_row SET error = 'Unknown location'
+            WHERE error IS NULL AND location_id IS NULL;
+            UPDATE udes_import_row SET error = 'Unknown product'
+            WHERE error IS NULL AND product_id IS NULL;
+            UPDATE udes_import_row SET error = 'Missing lot/serial number'
+            WHERE error IS NULL AND tracking IN ('lot', 'serial')
+              AND lot_name IS NULL;
+            UPDATE udes_import_row
+            SET error = 'Product is not tracked by lot/serial number'
+            WHERE error IS NULL AND tracking = 'none'
+              AND lot_name IS NOT NULL;
+            UPDATE udes_import_row
+            SET error = 'Quantity of a serial number must be 1'
+            WHERE error IS NULL AND tracking = 'serial'
+              AND quantity::numeric != 1;
+        """)
+
+    def _resolve_packages(self):
+        """ Resolve the existing packages of the rows by name """
+        self.env.cr.execute("""
+            WITH packages AS (
+                SELECT name, min(id) AS id, count(*) AS count
+                FROM stock_quant_package
+                WHERE name IN (SELECT package_name FROM udes_import_row
+                               WHERE error IS NULL)
+                GROUP BY name
+            )
+            UPDATE udes_import_row r
+            SET package_id = CASE WHEN p.count = 1 THEN p.id END,
+                error = CASE WHEN p.count > 1
+                             THEN 'Ambiguous package name' END
+            FROM packages p
+            WHERE p.name = r.package_name AND r.error IS NULL
+        """)
+
+    def _resolve_lots(self):
+        """ Resolve the existing lots/serial numbers of the rows by
+            product and name, and reject the serial numbers repeated.
+        """
+        self.env.cr.execute("""
+            UPDATE udes_import_row r
+            SET lot_id = l.id
+            FROM stock_production_lot l
+            WHERE l.name = r.lot_name AND l.product_id = r.product_id
+              AND r.error IS NULL;
+
+            UPDATE udes_import_row r
+            SET error = 'Serial number repeated in the file'
+            FROM (SELECT product_id, lot_name
+                  FROM udes_import_row
+                  WHERE error IS NULL AND tracking = 'serial'
+                  GROUP BY product_id, lot_name
+                  HAVING count(*) > 1) d
+            WHERE d.product_id = r.product_id AND d.lot_name = r.lot_name
+              AND r.error IS NULL;
+        """)
+
+    def _aggregate_quants(self):
+        """ Sum the quantities of the valid rows per quant, i.e., per
+            product, location, lot and package, and reject the rows of
+            quants that cannot be updated. Only the quants of existing
+            packages and lots can already exist.
+        """
+        self.env.cr.execute("""
+            INSERT INTO udes_import_quant
+                (location_id, company_id, product_id, product_uom_id,
+                 package_name, package_id, lot_name, lot_id,
+                 quantity, lines)
+            SELECT location_id, company_id, product_id, product_uom_id,
+                   package_name, package_id, lot_name, lot_id,
+                   SUM(quantity::numeric), array_agg(line)
+            FROM udes_import_row
+            WHERE error IS NULL
+            GROUP BY location_id, company_id, product_id, product_uom_id,
+                     package_name, package_id, lot_name, lot_id;
+
+            WITH invalid AS (
+                SELECT iq.id,
+                       CASE WHEN count(q.id) > 1
+                            THEN 'Several quants match the row'
+                            ELSE 'Quantity lower than the reserved quantity'
+                       END AS error
+                FROM udes_import_quant iq
+                JOIN stock_quant q
+                  ON q.product_id = iq.product_id
+                 AND q.location_id = iq.location_id
+                 AND q.lot_id IS NOT DISTINCT FROM iq.lot_id
+                 AND q.package_id IS NOT DISTINCT FROM iq.package_id
+                 AND q.owner_id IS NULL
+                WHERE (iq.package_name IS NULL OR iq.package_id IS NOT NULL)
+                  AND (iq.lot_name IS NULL OR iq.lot_id IS NOT NULL)
+                GROUP BY iq.id
+                HAVING count(q.id) > 1
+                    OR MAX(q.reserved_quantity) > MAX(iq.quantity)
+            ), rejected AS (
+                DELETE FROM udes_import_quant iq
+                USING invalid
+                WHERE invalid.id = iq.id
+                RETURNING iq.lines, invalid.error
+            )
+            UPDATE udes_import_row r
+            SET error = rejected.error
+            FROM rejected
+            WHERE r.line = ANY(rejected.lines);
+        """)
+
+    def _create_packages(self):
+        """ Create the packages of the quants to write that do not exist
+            and return their ids. Called once every row has been checked,
+            so no package is created for rejected rows only.
+        """
+        self.env.cr.execute("""
+            INSERT INTO stock_quant_package
+                (name, create_uid, create_date, write_uid, write_date)
+            SELECT DISTINCT package_name,
+                   %(uid)s, now() at time zone 'UTC',
+                   %(uid)s, now() at time zone 'UTC'
+            FROM udes_import_quant
+            WHERE package_name IS NOT NULL AND package_id IS NULL
+            RETURNING id
+        """, {'uid': self.env.uid})
+        package_ids = [id_ for id_, in self.env.cr.fetchall()]
+        if package_ids:
+            self.env.cr.execute("""
+                UPDATE udes_import_quant iq
+                SET package_id = p.id
+                FROM stock_quant_package p
+                WHERE p.id IN %s AND p.name = iq.package_name
+            """, (tuple(package_ids),))
+        return package_ids
+
+    def _create_lots(self):
+        """ Create the lots/serial numbers of the quants to write that do
+            not exist and return their ids. Called once every row has
+            been checked, so no lot is created for rejected rows only.
+        """
+        self.env.cr.execute("""
+            INSERT INTO stock_production_lot
+                (name, product_id, product_uom_id,
+                 create_uid, create_date, write_uid, write_date)
+            SELECT DISTINCT lot_name, product_id, product_uom_id,
+                   %(uid)s, now() at time zone 'UTC',
+                   %(uid)s, now() at time zone 'UTC'
+            FROM udes_import_quant
+            WHERE lot_name IS NOT NULL AND lot_id IS NULL
+            ON CONFLICT (name, product_id) DO NOTHING
+            RETURNING id
+        """, {'uid': self.env.uid})
+        lot_ids = [id_ for id_, in self.env.cr.fetchall()]
+        self.env.cr.execute("""
+            UPDATE udes_import_quant iq
+            SET lot_id = l.id
+            FROM stock_production_lot l
+            WHERE l.name = iq.lot_name AND l.product_id = iq.product_id
+              AND iq.lot_id IS NULL
+        """)
+        return lot_ids
+
+    def _upsert_quants(self, batch_size):
+        """ Update the quantity of the existing quants and create the
+            missing ones, batch_size quants at a time, and return the ids
+            of the quants.
+        """
+        self.env.cr.execute("SELECT COALESCE(MAX(id), 0) FROM udes_import_quant")
+        max_id = self.env.cr.fetchone()[0]
+        quant_ids = []
+        for start in range(0, max_id, batch_size):
+            params = {'uid': self.env.uid, 'start': start,
+                      'end': start + batch_size}
+            self.env.cr.execute("""
+                UPDATE stock_quant q
+                SET quantity = iq.quantity,
+                    write_uid = %(uid)s,
+                    write_date = now() at time zone 'UTC'
+                FROM udes_import_quant iq
+                WHERE iq.id > %(start)s AND iq.id <= %(end)s
+                  AND q.product_id = iq.product_id
+                  AND q.location_id = iq.location_id
+                  AND q.lot_id IS NOT DISTINCT FROM iq.lot_id
+                  AND q.package_id IS NOT DISTINCT FROM iq.package_id
+                  AND q.owner_id IS NULL
+                RETURNING q.id
+            """, params)
+            quant_ids.extend(id_ for id_, in self.env.cr.fetchall())
+            self.env.cr.execute("""
+                INSERT INTO stock_quant
+                    (product_id, location_id, company_id, lot_id, package_id,
+                     quantity, reserved_quantity, in_date,
+                     create_uid, create_date, write_uid, write_date)
+                SELECT iq.product_id, iq.location_id, iq.company_id,
+                       iq.lot_id, iq.package_id, iq.quantity, 0,
+                       now() at time zone 'UTC',
+                       %(uid)s, now() at time zone 'UTC',
+                       %(uid)s, now() at time zone 'UTC'
+                FROM udes_import_quant iq
+                WHERE iq.id > %(start)s AND iq.id <= %(end)s
+                  AND NOT EXISTS (
+                        SELECT 1 FROM stock_quant q
+                        WHERE q.product_id = iq.product_id
+                          AND q.location_id = iq.location_id
+                          AND q.lot_id IS NOT DISTINCT FROM iq.lot_id
+                          AND q.package_id IS NOT DISTINCT FROM iq.package_id
+                          AND q.owner_id IS NULL)
+                RETURNING id
+            """, params)
+            quant_ids.extend(id_ for id_, in self.env.cr.fetchall())
+        return quant_ids
+
+    @api.model
+    def import_stock(self, data, delimiter=',', batch_size=10000):
+        """ Load the stock in data into stock.quant, creating the missing
+            packages (stock.quant.package) and lots/serial numbers
+            (stock.production.lot), with COPY and set based queries.
+
+            @param data: string or file object
+                CSV content, with a header naming its columns among
+                location_barcode, product_barcode, quantity,
+                package_name and lot_name. The quantity of the quant of
+                each product, location, package and lot is set to the
+                sum of the quantities of its rows.
+            @param (optional) delimiter: string
+                Delimiter of the CSV, ',' by default ('\\t' for TSV).
+            @param (optional) batch_size: int
+                Number of quants written per query.
+
+            Invalid rows are rejected without aborting the import, and
+            no package or lot is created for them. Every line holds a
+            row, quoted fields cannot span lines.
+            Returns a dictionary with the number of quants written and
+            packages and lots created, and the rejected rows as a list
+            of dictionaries with keys line (in data, from 2) and error.
+        """
+        Package = self.env['stock.quant.package']
+        Quant = self.env['stock.quant']
+
+        if not self.env.user.has_group('stock.group_stock_manager'):
+            raise AccessError(_('Only stock managers can import stock.'))
+
+        self._create_staging_table()
+        self._copy_rows(data, delimiter)
+        self._resolve_rows()
+        self._resolve_packages()
+        self._resolve_lots()
+        self._aggregate_quants()
+        package_ids = self._create_packages()
+        lot_ids = self._create_lots()
+        quant_ids = self._upsert_quants(batch_size)
+
+        self.env.cr.execute("""
+            SELECT line + 1, error FROM udes_import_row
+            WHERE error IS NOT NULL
+            ORDER BY line
+        """)
+        rejected = [{'line': line, 'error': error}
+                    for line, error in self.env.cr.fetchall()]
+        self.env.cr.execute("DROP TABLE udes_import_raw, udes_import_row, "
+                            "udes_import_quant")
+
+        # the records have been written in SQL, update the cache and the
+        # stored fields depending on the quants
+        self.env.invalidate_all()
+        quants = Quant.browse(quant_ids)
+        packages = quants.mapped('package_id') | Package.browse(package_ids)
+        packages.modified(['quant_ids'])
+        packages.recompute()
+
+        return {
+            'quants': len(quant_ids),
+            'packages': len(package_ids),
+            'lots': len(lot_ids),
+            'rejected': rejected,
+        }
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+
+
+class UdesStockLevel(models.Model):
+    """ Quantities of the quants per location and product, as rows of
+        changes summed when read.
+
+        Each transaction changing quants adds its own row per location and
+        product, so concurrent transactions moving quants of the same
+        product in the same location (e.g. receipts into Input) do not
+        update a shared row and do not conflict. _consolidate() merges the
+        rows of the finished transactions periodically.
+    """
+    _name = 'udes.stock.level'
+    _description = 'UDES Stock Level'
+    _log_access = False
+
+    location_id = fields.Many2one('stock.location', 'Location', required=True,
+                                  index=True, readonly=True,
+                                  ondelete='cascade')
+    product_id = fields.Many2one('product.product', 'Product', required=True,
+                                 index=True, readonly=True,
+                                 ondelete='cascade')
+    quantity = fields.Float('Quantity', readonly=True,
+                            digits=0, default=0.0)
+    reserved_quantity = fields.Float('Reserved Quantity', readonly=True,
+                                     digits=0, default=0.0)
+
+    @api.model_cr
+    def init(self):
+        """ Create the trigger that records the changes of the stock levels
+            of every insert, update and delete of stock.quant, in a row per
+            transaction, location and product, and compute the stock
+            levels when the table is empty.
+
+            Transaction ids are 64 bits (they include the epoch), so the
+            txid column is added outside of the ORM.
+        """
+        self.env.cr.execute("""
+            ALTER TABLE udes_stock_level
+            DROP CONSTRAINT IF EXISTS udes_stock_level_location_product_uniq;
+            ALTER TABLE udes_stock_level ADD COLUMN IF NOT EXISTS txid bigint;
+            CREATE UNIQUE INDEX IF NOT EXISTS udes_stock_level_txid_uniq
+            ON udes_stock_level (location_id, product_id, txid);
+
+            CREATE OR REPLACE FUNCTION udes_stock_level_update()
+            RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    INSERT INTO udes_stock_level
+                        (location_id, product_id, txid,
+                         quantity, reserved_quantity)
+                    VALUES (OLD.location_id, OLD.product_id, txid_current(),
+                            -COALESCE(OLD.quantity, 0),
+                            -COALESCE(OLD.reserved_quantity, 0))
+                    ON CONFLICT (location_id, product_id, txid) DO UPDATE
+                    SET quantity = udes_stock_level.quantity
+                            + EXCLUDED.quantity,
+                        reserved_quantity = udes_stock_level.reserved_quantity
+                            + EXCLUDED.reserved_quantity;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO udes_stock_level
+                        (location_id, product_id, txid,
+                         quantity, reserved_quantity)
+                    VALUES (NEW.location_id, NEW.product_id, txid_current(),
+                            COALESCE(NEW.quantity, 0),
+                            COALESCE(NEW.reserved_quantity, 0))
+                    ON CONFLICT (location_id, product_id, txid) DO UPDATE
+                    SET quantity = udes_stock_level.quantity
+                            + EXCLUDED.quantity,
+                        reserved_quantity = udes_stock_level.reserved_quantity
+                            + EXCLUDED.reserved_quantity;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS udes_stock_level_trigger ON stock_quant;
+            CREATE TRIGGER udes_stock_level_trigger
+            AFTER INSERT OR DELETE
+               OR UPDATE OF location_id, product_id, quantity, reserved_quantity
+            ON stock_quant
+            FOR EACH ROW EXECUTE PROCEDURE udes_stock_level_update();
+        """)
+        self.env.cr.execute("SELECT 1 FROM udes_stock_level LIMIT 1")
+        if not self.env.cr.fetchone():
+            self._rebuild()
+
+    @api.model
+    def _rebuild(self):
+        """ Recompute all the stock levels from stock.quant
+        """
+        self.env.cr.execute("""
+            LOCK TABLE stock_quant IN SHARE MODE;
+            DELETE FROM udes_stock_level;
+            INSERT INTO udes_stock_level
+                (location_id, product_id, txid, quantity, reserved_quantity)
+            SELECT location_id, product_id, txid_current(),
+                   SUM(COALESCE(quantity, 0)),
+                   SUM(COALESCE(reserved_quantity, 0))
+            FROM stock_quant
+            GROUP BY location_id, product_id
+            HAVING SUM(COALESCE(quantity, 0)) != 0
+                OR SUM(COALESCE(reserved_quantity, 0)) != 0;
+        """)
+        self.invalidate_cache()
+
+    @api.model
+    def _consolidate(self):
+        """ Replace the rows of each location and product with several
+            rows by a single one with their sum, and remove the rows of
+            the products no longer in a location. The rows of transactions
+            still running are not visible, and are left as they are.
+        """
+        self.env.cr.execute("""
+            WITH levels AS (
+                SELECT location_id, product_id
+                FROM udes_stock_level
+                GROUP BY location_id, product_id
+                HAVING count(*) > 1
+                    OR (SUM(quantity) = 0 AND SUM(reserved_quantity) = 0)
+            ), deleted AS (
+                DELETE FROM udes_stock_level sl
+                USING levels l
+                WHERE sl.location_id = l.location_id
+                  AND sl.product_id = l.product_id
+                RETURNING sl.location_id, sl.product_id,
+                          sl.quantity, sl.reserved_quantity
+            )
+            INSERT INTO udes_stock_level
+                (location_id, product_id, txid, quantity, reserved_quantity)
+            SELECT location_id, product_id, txid_current(),
+                   SUM(quantity), SUM(reserved_quantity)
+            FROM deleted
+            GROUP BY location_id, product_id
+            HAVING SUM(quantity) != 0 OR SUM(reserved_quantity) != 0
+        """)
+        self.invalidate_cache()
+
+    @api.model
+    def get_quantities(self, location_ids, product_ids=None,
+                       include_children=True):
+        """ Returns the on hand and reserved quantities per product in the
+            locations in location_ids, read from the stock levels instead
+            of summing the quants.
+
+            @param location_ids: Array (int)
+                Locations to get the quantities of.
+            @param (optional) product_ids: Array (int)
+                Restrict the result to these products.
+            @param (optional) include_children: Boolean
+                Include the stock in the children of the locations.
+                Defaults to True
+
+            The result is a dictionary mapped by product id, where the
+            values are dictionaries with keys quantity and
+            reserved_quantity.
+        """
+        params = [location_ids]
+        if include_children:
+            location_clause = """
+                EXISTS (
+                    SELECT 1 FROM stock_location parent
+                    WHERE parent.id = ANY(%s)
+                      AND loc.parent_left >= parent.parent_left
+                      AND loc.parent_left < parent.parent_right
+                )"""
+        else:
+            location_clause = "sl.location_id = ANY(%s)"
+        product_clause = ''
+        if product_ids is not None:
+            product_clause = 'AND sl.product_id = ANY(%s)'
+            params.append(product_ids)
+
+        self.env.cr.execute("""
+            SELECT sl.product_id,
+                   SUM(sl.quantity),
+                   SUM(sl.reserved_quantity)
+            FROM udes_stock_level sl
+            JOIN stock_location loc ON loc.id = sl.location_id
+            WHERE {location_clause}
+            {product_clause}
+            GROUP BY sl.product_id
+        """.format(location_clause=location_clause,
+                   product_clause=product_clause), params)
+
+        return {product_id: {'quantity': quantity,
+                             'reserved_quantity': reserved_quantity}
+                for product_id, quantity, reserved_quantity
+                in self.env.cr.fetchall()}
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+
+# Tables of the change feed, with their model and the SQL expression
+# giving the picking type of a row (OLD) deleted from the table
+SYNC_TABLES = {
+    'stock_picking': ('stock.picking', 'OLD.picking_type_id'),
+    'stock_move': ('stock.move', 'OLD.picking_type_id'),
+    'stock_move_line': ('stock.move.line',
+                        '(SELECT picking_type_id FROM stock_picking '
+                        'WHERE id = OLD.picking_id)'),
+}
+
+
+class UdesSyncTombstone(models.Model):
+    _name = 'udes.sync.tombstone'
+    _description = 'UDES Sync Tombstone'
+    _log_access = False
+
+    res_model = fields.Char('Model', required=True, readonly=True)
+    res_id = fields.Integer('Record ID', required=True, readonly=True)
+    picking_type_id = fields.Integer('Picking Type ID', readonly=True,
+                                     index=True)
+    date = fields.Datetime('Date', required=True, readonly=True, index=True)
+
+    @api.model_cr
+    def init(self):
+        """ Add the u_sync_txid column, id of the transaction that last
+            changed the row, to the tables of the change feed with the
+            trigger keeping it up to date, and the trigger recording a
+            tombstone for each row deleted.
+
+            Transaction ids are 64 bits (they include the epoch), so the
+            columns are added outside of the ORM.
+        """
+        self.env.cr.execute("""
+            ALTER TABLE udes_sync_tombstone
+            ADD COLUMN IF NOT EXISTS txid bigint;
+            CREATE INDEX IF NOT EXISTS udes_sync_tombstone_txid_idx
+            ON udes_sync_tombstone (txid);
+
+            CREATE OR REPLACE FUNCTION udes_sync_txid_update()
+            RETURNS trigger AS $$
+            BEGIN
+                NEW.u_sync_txid := txid_current();
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        for table, (model, picking_type) in SYNC_TABLES.items():
+            self.env.cr.execute("""
+                ALTER TABLE {table} ADD COLUMN IF NOT EXISTS u_sync_txid bigint;
+                CREATE INDEX IF NOT EXISTS {table}_u_sync_txid_idx
+                ON {table} (u_sync_txid);
+
+                DROP TRIGGER IF EXISTS udes_sync_txid_trigger ON {table};
+                CREATE TRIGGER udes_sync_txid_trigger
+                BEFORE INSERT OR UPDATE ON {table}
+                FOR EACH ROW EXECUTE PROCEDURE udes_sync_txid_update();
+
+                CREATE OR REPLACE FUNCTION udes_sync_tombstone_{table}()
+                RETURNS trigger AS $$
+                BEGIN
+                    INSERT INTO udes_sync_tombstone
+                        (res_model, res_id, picking_type_id, date, txid)
+                    VALUES ('{model}', OLD.id, {picking_type},
+                            now() at time zone 'UTC', txid_current());
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                DROP TRIGGER IF EXISTS udes_sync_tombstone_trigger ON {table};
+                CREATE TRIGGER udes_sync_tombstone_trigger
+                AFTER DELETE ON {table}
+                FOR EACH ROW EXECUTE PROCEDURE udes_sync_tombstone_{table}();
+            """.format(table=table, model=model, picking_type=picking_type))
+
+    def _get_ttl(self):
+        """ Days the tombstones are kept, from the system parameter
+            udes_core.sync_tombstone_ttl (7 by default)
+        """
+        Config = self.env['ir.config_parameter'].sudo()
+        return int(Config.get_param('udes_core.sync_tombstone_ttl', 7))
+
+    @api.model
+    def get_min_cursor(self):
+        """ Return the oldest cursor the removals are known since, older
+            cursors have to sync from scratch.
+        """
+        Config = self.env['ir.config_parameter'].sudo()
+        return int(Config.get_param('udes_core.sync_min_cursor', 0))
+
+    @api.model
+    def get_current_cursor(self):
+        """ Return the cursor of the changes visible now: transactions
+            with a lower id have all finished, later transactions may
+            still commit changes.
+        """
+        self.env.cr.execute(
+            "SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def get_removed(self, cursor, picking_type_ids=None):
+        """ Return a dictionary mapping each model of the change feed to
+            the ids of its records removed by transactions since cursor,
+            in the picking types in picking_type_ids (all when None).
+        """
+        self.env.cr.execute("""
+            SELECT res_model, array_agg(DISTINCT res_id)
+            FROM udes_sync_tombstone
+            WHERE txid >= %s
+              AND (%s IS NULL OR picking_type_id IS NULL
+                   OR picking_type_id = ANY(%s))
+            GROUP BY res_model
+        """, (cursor, picking_type_ids, picking_type_ids))
+        removed = {model: [] for model, _picking_type
+                   in SYNC_TABLES.values()}
+        removed.update(self.env.cr.fetchall())
+        return removed
+
+    @api.model
+    def _gc_tombstones(self):
+        """ Remove the tombstones older than the TTL and move the oldest
+            cursor accepted after them.
+        """
+        Config = self.env['ir.config_parameter'].sudo()
+        self.env.cr.execute("""
+            DELETE FROM udes_sync_tombstone
+            WHERE date < (now() at time zone 'UTC') - interval '1 day' * %s
+            RETURNING txid
+        """, (self._get_ttl(),))
+        txids = [txid for txid, in self.env.cr.fetchall()]
+        if txids:
+            min_cursor = max(max(txids) + 1, self.get_min_cursor())
+            Config.set_param('udes_core.sync_min_cursor', str(min_cursor))
+        return len(txids)
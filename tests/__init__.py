@@ -2,5 +2,17 @@
 
 from . import common
 from . import test_res_users
+from . import test_instrumentation
+from . import test_udes_job
+from . import test_replica
 from . import test_picking
 from . import test_update_picking
+from . import test_stock_quant
+from . import test_stock_location
+from . import test_benchmark
+from . import test_query_budget
+from . import test_create_picking
+from . import test_stock_import
+from . import test_scan_identifier
+from . import test_bulk_archive
+from . import test_picking_changes
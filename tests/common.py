@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 
+from contextlib import contextmanager
+
 from odoo.tests import common
 
+from ..instrumentation import CallMetrics
+
 class BaseUDES(common.SavepointCase):
 
     @classmethod
@@ -173,3 +177,17 @@ class BaseUDES(common.SavepointCase):
         }
         vals.update(kwargs)
         return Company.create(vals)
+
+    @contextmanager
+    def assertQueryBudget(self, budget, msg=None):
+        """ Fail when the code run inside the context executes more than
+            budget SQL queries. The cache is emptied beforehand so the
+            queries to load the records are counted.
+        """
+        self.env.invalidate_all()
+        with CallMetrics(self.env.cr) as metrics:
+            yield metrics
+        self.assertLessEqual(
+            metrics.queries, budget,
+            msg or '%s SQL queries executed, the budget is %s' %
+            (metrics.queries, budget))
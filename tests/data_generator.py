@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+
+class WarehouseDataGenerator(object):
+    """ Creates repeatable synthetic warehouse data: a deep tree of
+        locations, products (some tracked by serial number), quants,
+        packages and multi-step picking chains.
+
+        The same seed generates the same data, so the results of runs
+        using it can be compared.
+    """
+
+    def __init__(self, env, seed=0, prefix='GEN'):
+        self.env = env
+        self.random = random.Random(seed)
+        self.prefix = prefix
+        self._sequence = 0
+
+    def _next_name(self, kind):
+        """ Return a unique name for a record of kind """
+        self._sequence += 1
+        return '{}{}{:06d}'.format(self.prefix, kind, self._sequence)
+
+    def create_locations(self, parent, depth, fanout):
+        """ Create a tree of locations under parent with depth levels and
+            fanout children per location, and return the leaf locations.
+        """
+        Location = self.env['stock.location']
+
+        # compute the parent_left/parent_right intervals once at the end
+        # instead of after each location creation
+        DeferredLocation = Location.with_context(
+            defer_parent_store_computation=True)
+        level = parent
+        for _depth in range(depth):
+            children = Location.browse()
+            for location in level:
+                for _child in range(fanout):
+                    name = self._next_name('L')
+                    children |= DeferredLocation.create({
+                        'name': name,
+                        'barcode': name,
+                        'location_id': location.id,
+                    })
+            level = children
+        Location._parent_store_compute()
+        return level.with_env(self.env)
+
+    def create_products(self, count, serial_ratio=0.1):
+        """ Create count products, serial_ratio of them tracked by serial
+            number, and return them.
+        """
+        Product = self.env['product.product']
+
+        products = Product.browse()
+        for _index in range(count):
+            name = self._next_name('P')
+            tracking = 'serial' if self.random.random() < serial_ratio \
+                else 'none'
+            products |= Product.create({
+                'name': name,
+                'barcode': name,
+                'default_code': name,
+                'type': 'product',
+                'tracking': tracking,
+            })
+        return products
+
+    def create_quants(self, locations, products, per_location,
+                      package_ratio=0.5, max_qty=100):
+        """ Create per_location quants of random products in each of the
+            locations. The quants of package_ratio of the locations are
+            put in a package. Products tracked by serial number get one
+            quant of quantity 1 per serial number.
+
+            Returns the quants and the packages created.
+        """
+        Quant = self.env['stock.quant']
+        Package = self.env['stock.quant.package']
+        Lot = self.env['stock.production.lot']
+
+        quants = Quant.browse()
+        packages = Package.browse()
+        for location in locations:
+            package = Package.browse()
+            if self.random.random() < package_ratio:
+                package = Package.create({'name': self._next_name('PK')})
+                packages |= package
+            for _index in range(per_location):
+                product = self.random.choice(products)
+                vals = {
+                    'product_id': product.id,
+                    'location_id': location.id,
+                    'package_id': package.id,
+                }
+                if product.tracking == 'serial':
+                    lot = Lot.create({'name': self._next_name('SN'),
+                                      'product_id': product.id})
+                    vals.update(quantity=1, lot_id=lot.id)
+                else:
+                    vals['quantity'] = self.random.randint(1, max_qty)
+                quants |= Quant.create(vals)
+        return quants, packages
+
+    def create_picking_chain(self, picking_types, products, lines):
+        """ Create one confirmed picking per picking type with lines moves
+            of random untracked products, where the moves of each picking
+            are chained to the moves of the next one.
+
+            Returns the pickings in chain order.
+        """
+        Picking = self.env['stock.picking']
+        Move = self.env['stock.move']
+
+        untracked = products.filtered(lambda p: p.tracking == 'none')
+        move_products = [self.random.choice(untracked) for _index in range(lines)]
+        pickings = Picking.browse()
+        previous_moves = [Move.browse()] * lines
+        for picking_type in picking_types:
+            picking = Picking.create({
+                'picking_type_id': picking_type.id,
+                'location_id': picking_type.default_location_src_id.id,
+                'location_dest_id': picking_type.default_location_dest_id.id,
+                'origin': self._next_name('O'),
+            })
+            moves = []
+            for product, previous_move in zip(move_products, previous_moves):
+                moves.append(Move.create({
+                    'name': product.name,
+                    'product_id': product.id,
+                    'product_uom': product.uom_id.id,
+                    'product_uom_qty': self.random.randint(1, 10),
+                    'location_id': picking.location_id.id,
+                    'location_dest_id': picking.location_dest_id.id,
+                    'picking_id': picking.id,
+                    'picking_type_id': picking_type.id,
+                    'move_orig_ids': [(6, 0, previous_move.ids)],
+                }))
+            previous_moves = moves
+            picking.action_confirm()
+            pickings |= picking
+        return pickings
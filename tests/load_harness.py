@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent scanner load test for the picking operations of udes_core.
+
+It is not part of the test suite. It runs against an existing database
+(e.g., a local PostgreSQL with data created by data_generator) with many
+worker threads, each with its own cursor and transactions, calling
+create_picking, update_picking and get_pickings on overlapping or
+disjoint data, and reports throughput, latency percentiles, retries,
+serialization failures, deadlocks and lock contention per operation.
+
+    python3 load_harness.py -c odoo.conf -d DATABASE --location LOC_BARCODE \\
+        --workers 16 --duration 60 --overlap
+
+By default every transaction is rolled back, so the data is not
+modified and the run can be repeated; use --commit to keep the changes.
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+
+import psycopg2
+from psycopg2 import errorcodes
+
+import odoo
+from odoo import api, SUPERUSER_ID
+from odoo.exceptions import UserError, ValidationError
+
+_logger = logging.getLogger(__name__)
+
+CONCURRENCY_ERRORS = (errorcodes.SERIALIZATION_FAILURE,
+                      errorcodes.DEADLOCK_DETECTED,
+                      errorcodes.LOCK_NOT_AVAILABLE)
+
+# The quants and the picking updates fail at once when another transaction
+# holds their lock, with these errors instead of LOCK_NOT_AVAILABLE
+LOCK_ERROR_MESSAGES = ('in use by another operation',
+                       'being updated by another user')
+
+
+class OperationStats(object):
+    """ Thread safe statistics of an operation """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.retries = 0
+        self.serialization_failures = 0
+        self.deadlocks = 0
+        self.lock_failures = 0
+
+    def add(self, latency=None, error=False, retries=0, codes=()):
+        with self.lock:
+            if latency is not None:
+                self.latencies.append(latency)
+            self.errors += int(error)
+            self.retries += retries
+            for code in codes:
+                if code == errorcodes.SERIALIZATION_FAILURE:
+                    self.serialization_failures += 1
+                elif code == errorcodes.DEADLOCK_DETECTED:
+                    self.deadlocks += 1
+                elif code == errorcodes.LOCK_NOT_AVAILABLE:
+                    self.lock_failures += 1
+
+    @staticmethod
+    def _percentile(values, percent):
+        if not values:
+            return None
+        index = min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))
+        return round(values[index], 6)
+
+    def report(self, duration):
+        latencies = sorted(self.latencies)
+        return {
+            'calls': len(latencies),
+            'throughput': round(len(latencies) / duration, 3),
+            'p50': self._percentile(latencies, 50),
+            'p90': self._percentile(latencies, 90),
+            'p99': self._percentile(latencies, 99),
+            'max': self._percentile(latencies, 100),
+            'errors': self.errors,
+            'retries': self.retries,
+            'serialization_failures': self.serialization_failures,
+            'deadlocks': self.deadlocks,
+            'lock_not_available': self.lock_failures,
+        }
+
+
+class LoadHarness(object):
+    """ Runs the scanner operations concurrently against dbname """
+
+    def __init__(self, dbname, location_barcode, uid=SUPERUSER_ID,
+                 workers=8, duration=60, overlap=False, commit=False,
+                 quants_per_picking=5, max_retries=5, seed=0):
+        self.registry = odoo.registry(dbname)
+        self.uid = uid
+        self.workers = workers
+        self.duration = duration
+        self.overlap = overlap
+        self.commit = commit
+        self.quants_per_picking = quants_per_picking
+        self.max_retries = max_retries
+        self.seed = seed
+        self.stats = defaultdict(OperationStats)
+        self._load_data(location_barcode)
+
+    def _load_data(self, location_barcode):
+        """ Read the quants and pickings of the location the workers use """
+        with api.Environment.manage(), self.registry.cursor() as cr:
+            env = api.Environment(cr, self.uid, {})
+            location = env['stock.location'].get_location(location_barcode)
+            self.location_id = location.id
+            quants = env['stock.quant'].search([
+                ('location_id', 'child_of', location.id),
+                ('reserved_quantity', '=', 0),
+                ('package_id', '=', False),
+            ])
+            self.quant_ids = quants.ids
+            self.picking_ids = env['stock.picking'].search([
+                ('location_id', 'child_of', location.id),
+                ('state', '=', 'assigned'),
+            ]).ids
+        if not self.quant_ids:
+            raise UserError('No unreserved quants in location %s' %
+                            location_barcode)
+
+    def _partition(self, ids, worker):
+        """ Ids used by worker, all of them when overlapping """
+        if self.overlap:
+            return ids
+        return ids[worker::self.workers] or ids
+
+    def _run_transaction(self, name, function):
+        """ Run function(env) in a new transaction, retrying concurrency
+            errors with jittered exponential backoff, and record it.
+        """
+        stats = self.stats[name]
+        codes = []
+        start = time.time()
+        for attempt in range(self.max_retries + 1):
+            try:
+                with api.Environment.manage(), self.registry.cursor() as cr:
+                    env = api.Environment(cr, self.uid, {})
+                    try:
+                        function(env)
+                    finally:
+                        if not self.commit:
+                            cr.rollback()
+                stats.add(latency=time.time() - start, retries=attempt,
+                          codes=codes)
+                return
+            except psycopg2.OperationalError as e:
+                if e.pgcode not in CONCURRENCY_ERRORS:
+                    break
+                codes.append(e.pgcode)
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+            except ValidationError as e:
+                if not any(message in e.name
+                           for message in LOCK_ERROR_MESSAGES):
+                    _logger.debug('%s failed', name, exc_info=True)
+                    break
+                codes.append(errorcodes.LOCK_NOT_AVAILABLE)
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+            except Exception:
+                _logger.debug('%s failed', name, exc_info=True)
+                break
+        stats.add(error=True, retries=len(codes), codes=codes)
+
+    def _worker(self, worker):
+        rand = random.Random(self.seed + worker)
+        quant_ids = self._partition(self.quant_ids, worker)
+        picking_ids = self._partition(self.picking_ids, worker)
+        end = time.time() + self.duration
+
+        def create_picking(env):
+            quants = rand.sample(quant_ids,
+                                 min(self.quants_per_picking, len(quant_ids)))
+            env['stock.picking'].create_picking(quants, self.location_id)
+
+        def update_picking(env):
+            picking = env['stock.picking'].browse(rand.choice(picking_ids))
+            picking.update_picking(force_validate=True)
+
+        def get_pickings(env):
+            env['stock.picking'].get_pickings(location_id=self.location_id)
+
+        operations = [('create_picking', create_picking),
+                      ('get_pickings', get_pickings)]
+        if picking_ids:
+            operations.append(('update_picking', update_picking))
+        while time.time() < end:
+            name, function = rand.choice(operations)
+            self._run_transaction(name, function)
+
+    def run(self):
+        """ Run the workers and return the report of each operation """
+        threads = [threading.Thread(target=self._worker, args=(worker,))
+                   for worker in range(self.workers)]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.time() - start
+        return {name: stats.report(duration)
+                for name, stats in sorted(self.stats.items())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-c', '--config', help='Odoo configuration file')
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument('--location', required=True,
+                        help='Barcode of the location to take quants from')
+    parser.add_argument('--uid', type=int, default=SUPERUSER_ID)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=60,
+                        help='Seconds each worker runs')
+    parser.add_argument('--overlap', action='store_true',
+                        help='All the workers use the same quants and '
+                             'pickings instead of disjoint ones')
+    parser.add_argument('--commit', action='store_true',
+                        help='Commit the transactions instead of rolling '
+                             'them back')
+    parser.add_argument('--quants-per-picking', type=int, default=5)
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    odoo_args = ['-d', args.database]
+    if args.config:
+        odoo_args += ['-c', args.config]
+    odoo.tools.config.parse_config(odoo_args)
+    # each worker holds a connection
+    odoo.tools.config['db_maxconn'] = max(odoo.tools.config['db_maxconn'],
+                                          args.workers + 4)
+
+    harness = LoadHarness(args.database, args.location, uid=args.uid,
+                          workers=args.workers, duration=args.duration,
+                          overlap=args.overlap, commit=args.commit,
+                          quants_per_picking=args.quants_per_picking,
+                          max_retries=args.max_retries, seed=args.seed)
+    print(json.dumps(harness.run(), indent=4))
+
+
+if __name__ == '__main__':
+    main()
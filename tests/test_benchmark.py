@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import tracemalloc
+import unittest
+from contextlib import contextmanager
+
+from . import common
+from .data_generator import WarehouseDataGenerator
+from ..instrumentation import CallMetrics
+
+_logger = logging.getLogger(__name__)
+
+# Benchmarks are slow, they only run when UDES_BENCHMARK is set.
+# UDES_BENCHMARK_SIZE scales the generated data (defaults to 1) and
+# UDES_BENCHMARK_OUTPUT is the path of the json file the results are
+# written to.
+BENCHMARK_SIZE = int(os.environ.get('UDES_BENCHMARK_SIZE', 1))
+
+
+@unittest.skipUnless(os.environ.get('UDES_BENCHMARK'),
+                     'Set UDES_BENCHMARK to run the benchmarks')
+class TestBenchmark(common.BaseUDES):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestBenchmark, cls).setUpClass()
+        User = cls.env['res.users']
+
+        cls.results = {}
+        cls.warehouse = User.get_user_warehouse()
+        generator = WarehouseDataGenerator(cls.env, seed=0, prefix='BENCH')
+
+        # a zone with 2 aisles per size unit, 5 bays per aisle and
+        # 10 bins per bay
+        cls.zone = generator.create_locations(cls.stock_location, 1, 1)
+        aisles = generator.create_locations(cls.zone, 1, 2 * BENCHMARK_SIZE)
+        bays = generator.create_locations(aisles, 1, 5)
+        cls.bins = generator.create_locations(bays, 1, 10)
+
+        cls.products = generator.create_products(100 * BENCHMARK_SIZE)
+        cls.quants, cls.packages = generator.create_quants(
+            cls.bins, cls.products, per_location=4)
+
+        cls.picking_chain = generator.create_picking_chain(
+            cls.warehouse.pick_type_id | cls.warehouse.pack_type_id |
+            cls.warehouse.out_type_id,
+            cls.products, lines=50 * BENCHMARK_SIZE)
+
+    @classmethod
+    def tearDownClass(cls):
+        output = os.environ.get('UDES_BENCHMARK_OUTPUT')
+        if output:
+            with open(output, 'w') as f:
+                json.dump({'size': BENCHMARK_SIZE, 'results': cls.results},
+                          f, indent=4, sort_keys=True)
+        super(TestBenchmark, cls).tearDownClass()
+
+    @contextmanager
+    def measure(self, name):
+        """ Record the call metrics (wall time, SQL queries, SQL time and
+            records touched) and peak memory of the code run inside the
+            context, starting from an empty cache.
+        """
+        self.env.invalidate_all()
+        tracemalloc.start()
+        with CallMetrics(self.env.cr) as metrics:
+            yield
+        _current, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.results[name] = dict(metrics.to_dict(), peak_memory=peak_memory)
+        _logger.info('Benchmark %s: %s', name, self.results[name])
+
+    def test01_get_pickings_by_origin(self):
+        """ Benchmark get_pickings by origin """
+        Picking = self.env['stock.picking']
+        origin = self.picking_chain[0].origin
+        with self.measure('get_pickings_by_origin'):
+            Picking.get_pickings(origin=origin)
+
+    def test02_get_pickings_by_package_name(self):
+        """ Benchmark get_pickings by package name """
+        Picking = self.env['stock.picking']
+        with self.measure('get_pickings_by_package_name'):
+            Picking.get_pickings(package_name=self.packages[0].name)
+
+    def test03_get_info(self):
+        """ Benchmark get_info of a picking chain """
+        with self.measure('get_info'):
+            self.picking_chain.get_info()
+
+    def test04_create_picking(self):
+        """ Benchmark create_picking of all the quants of the zone """
+        Picking = self.env['stock.picking']
+        with self.measure('create_picking'):
+            Picking.create_picking(self.quants.ids, self.zone.id,
+                                   picking_type_id=self.picking_type_internal.id)
+
+    def test05_update_picking(self):
+        """ Benchmark update_picking marking a package as done and
+            validating the picking
+        """
+        Picking = self.env['stock.picking']
+        package = self.packages[0]
+        picking = Picking.create_picking(
+            package.quant_ids.ids, self.zone.id,
+            picking_type_id=self.picking_type_internal.id)
+        with self.measure('update_picking_package'):
+            picking.update_picking(package_name=package.name)
+        with self.measure('update_picking_validate'):
+            picking.update_picking(validate=True)
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+from . import common
+
+
+class TestBulkArchive(common.BaseUDES):
+
+    def test01_bulk_archive_locations(self):
+        """ Checks that locations are archived with one message on their
+            common ancestor and none on the locations
+        """
+        messages = self.test_locations.mapped('message_ids')
+        parent_messages = self.stock_location.message_ids
+
+        archived = self.test_locations.bulk_archive()
+        self.assertEqual(archived, self.test_locations)
+        self.assertFalse(any(self.test_locations.mapped('active')))
+        self.assertEqual(self.test_locations.mapped('message_ids'), messages)
+        new_messages = self.stock_location.message_ids - parent_messages
+        self.assertEqual(len(new_messages), 1)
+        self.assertIn(self.test_location_01.name, new_messages.body)
+
+        # archived locations are not changed again
+        self.assertFalse(self.test_locations.bulk_archive())
+
+        unarchived = self.test_locations.bulk_unarchive()
+        self.assertEqual(unarchived, self.test_locations)
+        self.assertTrue(all(self.test_locations.mapped('active')))
+
+    def test02_bulk_archive_products_deferred_tracking(self):
+        """ Checks that the tracking of each product is done by a job """
+        Job = self.env['udes.job']
+
+        products = self.apple | self.banana
+        products.bulk_archive(defer_tracking=True)
+        self.assertFalse(any(products.mapped('active')))
+
+        job = Job.search([('model_name', '=', 'product.product'),
+                          ('method', '=', '_track_active_change')])
+        self.assertEqual(len(job), 1)
+        messages = products.mapped('message_ids')
+        job.run_job()
+        self.assertEqual(job.state, 'done')
+        for product in products:
+            tracking = (product.message_ids - messages).mapped(
+                'tracking_value_ids')
+            self.assertEqual(tracking.mapped('field'), ['active'])
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+from odoo import SUPERUSER_ID, api
+from odoo.exceptions import ValidationError
+
+from ..common import check_many2one_validity, check_many2one_validities
+from . import common
+
+
+class TestCreatePicking(common.BaseUDES):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestCreatePicking, cls).setUpClass()
+        Package = cls.env['stock.quant.package']
+
+        cls.package = Package.get_package('test_create_package', create=True)
+        cls.apple_quant = cls.create_quant(cls.apple.id,
+                                           cls.test_location_01.id, 5,
+                                           package_id=cls.package.id)
+        cls.banana_quant = cls.create_quant(cls.banana.id,
+                                            cls.test_location_01.id, 3,
+                                            package_id=cls.package.id)
+        cls.cherry_quant = cls.create_quant(cls.cherry.id,
+                                            cls.test_location_02.id, 2)
+        cls.damson_quant = cls.create_quant(cls.damson.id,
+                                            cls.test_location_02.id, 4)
+
+    def test01_create_picking_from_quants(self):
+        """ Checks create_picking creates and reserves a move per
+            product of the quants
+        """
+        Picking = self.env['stock.picking']
+        quants = self.apple_quant | self.banana_quant
+        picking = Picking.create_picking(
+            quants.ids, self.test_location_01.id,
+            picking_type_id=self.picking_type_internal.id)
+        self.assertEqual(picking.move_lines.mapped('product_id'),
+                         self.apple | self.banana)
+        self.assertEqual(picking.state, 'assigned')
+
+    def test02_partition_picking_specs(self):
+        """ Checks specs sharing quants or packages are in the same group
+        """
+        Picking = self.env['stock.picking']
+        specs = [
+            {'quant_ids': self.apple_quant.ids},
+            {'quant_ids': self.cherry_quant.ids},
+            {'quant_ids': self.banana_quant.ids},
+            {'quant_ids': self.damson_quant.ids},
+            {'quant_ids': self.cherry_quant.ids},
+        ]
+        self.assertEqual(Picking._partition_picking_specs(specs),
+                         [[0, 2], [1, 4], [3]])
+
+    def test03_create_pickings_bulk(self):
+        """ Checks create_pickings_bulk creates the valid pickings and
+            reports the errors of the invalid specs
+        """
+        Picking = self.env['stock.picking']
+        quants = self.apple_quant | self.banana_quant
+        specs = [
+            {'quant_ids': quants.ids,
+             'location_id': self.test_location_01.id,
+             'picking_type_id': self.picking_type_internal.id},
+            {'quant_ids': self.cherry_quant.ids,
+             'location_id': self.test_location_02.id,
+             'picking_type_id': self.picking_type_internal.id},
+            # incomplete package
+            {'quant_ids': self.apple_quant.ids,
+             'location_id': self.test_location_01.id,
+             'picking_type_id': self.picking_type_internal.id},
+        ]
+        res = Picking.create_pickings_bulk(specs)
+        self.assertTrue(res['picking_ids'][0])
+        self.assertTrue(res['picking_ids'][1])
+        self.assertFalse(res['picking_ids'][2])
+        self.assertEqual(res['errors'][:2], [None, None])
+        self.assertIn(self.package.name, res['errors'][2])
+        self.assertEqual(Picking.browse(res['picking_ids'][1]).move_lines.product_id,
+                         self.cherry)
+
+    def test04_create_picking_invalid_locations(self):
+        """ Checks every invalid location is reported at once """
+        Picking = self.env['stock.picking']
+        with self.assertRaises(ValidationError) as e:
+            Picking.create_picking(
+                self.apple_quant.ids, 0, location_dest_id=-1,
+                picking_type_id=self.picking_type_internal.id)
+        self.assertIn('location_id', e.exception.name)
+        self.assertIn('location_dest_id', e.exception.name)
+
+    def test05_check_many2one_validities(self):
+        """ Checks the references are validated with one query per model
+        """
+        Location = self.env['stock.location']
+        Product = self.env['product.product']
+        references = [
+            ('location_id', Location, self.test_location_01.id),
+            ('location_dest_id', Location, self.test_location_02.id),
+            ('product_id', Product, self.apple.id),
+            ('other_product_id', Product, self.banana.id),
+        ]
+        with self.assertQueryBudget(2):
+            check_many2one_validities(references)
+
+    def test06_create_pickings_bulk_malformed_spec(self):
+        """ Checks a malformed spec is reported as the error of the spec
+            without aborting the others, also when metrics are requested
+        """
+        Picking = self.env['stock.picking'].with_context(udes_metrics=True)
+        specs = [
+            {'quant_ids': self.cherry_quant.ids,
+             'location_id': self.test_location_02.id,
+             'picking_type_id': self.picking_type_internal.id},
+            # missing location_id
+            {'quant_ids': self.damson_quant.ids},
+        ]
+        res = Picking.create_pickings_bulk(specs)
+        self.assertTrue(res['picking_ids'][0])
+        self.assertIsNone(res['errors'][0])
+        self.assertFalse(res['picking_ids'][1])
+        self.assertIn('location_id', res['errors'][1])
+
+    def test07_create_pickings_bulk_jobs(self):
+        """ Checks create_pickings_bulk with use_jobs enqueues a job per
+            group, and their result is read once they have run
+        """
+        Picking = self.env['stock.picking']
+        Job = self.env['udes.job']
+        specs = [
+            {'quant_ids': self.cherry_quant.ids,
+             'location_id': self.test_location_02.id,
+             'picking_type_id': self.picking_type_internal.id},
+            {'quant_ids': self.damson_quant.ids,
+             'location_id': self.test_location_02.id,
+             'picking_type_id': self.picking_type_internal.id},
+            # missing location_id
+            {'quant_ids': self.apple_quant.ids},
+        ]
+        res = Picking.create_pickings_bulk(specs, use_jobs=True)
+        jobs = Job.browse(res['job_ids'])
+        self.assertEqual(len(jobs), 3)
+        self.assertEqual(Picking.get_pickings_bulk_result(jobs.ids)['pending'],
+                         [0, 1, 2])
+
+        for job in jobs:
+            job.run_job()
+        res = Picking.get_pickings_bulk_result(jobs.ids)
+        self.assertEqual(res['pending'], [])
+        self.assertTrue(res['picking_ids'][0])
+        self.assertTrue(res['picking_ids'][1])
+        self.assertFalse(res['picking_ids'][2])
+        self.assertEqual(res['errors'][:2], [None, None])
+        self.assertIn('location_id', res['errors'][2])
+        self.assertEqual(
+            Picking.browse(res['picking_ids'][1]).move_lines.product_id,
+            self.damson)
+
+    def test08_create_picking_move_parent_package(self):
+        """ Checks create_picking with move_parent_package moves all the
+            quants of the pallet containing the package of the quants
+        """
+        Picking = self.env['stock.picking']
+        Package = self.env['stock.quant.package']
+        pallet = Package.get_package('test_create_pallet', create=True)
+        carton = Package.get_package('test_create_carton', create=True)
+        self.package.u_parent_package_id = pallet
+        carton.u_parent_package_id = pallet
+        fig_quant = self.create_quant(self.fig.id, self.test_location_01.id,
+                                      6, package_id=carton.id)
+
+        picking = Picking.create_picking(
+            self.apple_quant.ids, self.test_location_01.id,
+            picking_type_id=self.picking_type_internal.id,
+            move_parent_package=True)
+        self.assertEqual(picking.move_lines.mapped('product_id'),
+                         self.apple | self.banana | self.fig)
+        self.assertEqual(picking.move_line_ids.mapped('package_id'),
+                         self.package | carton)
+        self.assertEqual(fig_quant.reserved_quantity, 6)
+
+    def test09_create_picking_quants_in_use(self):
+        """ Checks create_picking fails at once when another transaction
+            has locked the quants. The test transaction cannot see data
+            committed after it started, so the quant is committed first,
+            then locked and used from two new transactions.
+        """
+        with api.Environment.manage(), self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            product = env['product.product'].create({
+                'name': 'Locked quant',
+                'barcode': 'productLockedQuant',
+                'type': 'product',
+            })
+            quant = env['stock.quant'].create({
+                'product_id': product.id,
+                'location_id': self.stock_location.id,
+                'quantity': 1,
+            })
+            product_id = product.id
+            quant_id = quant.id
+
+        try:
+            with api.Environment.manage(), \
+                    self.registry.cursor() as lock_cr, \
+                    self.registry.cursor() as cr:
+                try:
+                    lock_cr.execute("SELECT id FROM stock_quant "
+                                    "WHERE id = %s FOR UPDATE", (quant_id,))
+                    env = api.Environment(cr, SUPERUSER_ID, {})
+                    with self.assertRaises(ValidationError) as e:
+                        env['stock.picking'].create_picking(
+                            [quant_id], self.stock_location.id,
+                            picking_type_id=self.picking_type_internal.id)
+                    self.assertIn('in use', e.exception.name)
+                finally:
+                    cr.rollback()
+                    lock_cr.rollback()
+        finally:
+            with api.Environment.manage(), self.registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                env['stock.quant'].browse(quant_id).unlink()
+                env['product.product'].browse(product_id).unlink()
+
+    def test10_check_many2one_validities_string_ids(self):
+        """ Checks ids given as strings are accepted, as by search() """
+        Location = self.env['stock.location']
+        check_many2one_validity('location_id', Location,
+                                str(self.test_location_01.id))
+        with self.assertRaises(ValidationError):
+            check_many2one_validity('location_id', Location, 'abc')
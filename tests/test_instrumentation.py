@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import io
+import json
+import zipfile
+
+from . import common
+from .. import instrumentation
+from ..instrumentation import CallMetrics
+
+
+class TestInstrumentation(common.BaseUDES):
+
+    def test01_nested_call_metrics(self):
+        """ Checks that nested CallMetrics both count the queries and the
+            cursor is restored after them
+        """
+        cr = self.env.cr
+        with CallMetrics(cr) as outer:
+            cr.execute("SELECT 1")
+            with CallMetrics(cr) as inner:
+                cr.execute("SELECT 1")
+            cr.execute("SELECT 1")
+        self.assertEqual(inner.queries, 1)
+        self.assertEqual(outer.queries, 3)
+        self.assertNotIn('execute', cr.__dict__)
+
+    def test02_udes_metrics_result(self):
+        """ Checks that the metrics are returned with the result when the
+            udes_metrics context variable is set
+        """
+        Location = self.env['stock.location']
+        res = Location.with_context(udes_metrics=True).get_location(
+            self.test_location_01.barcode)
+        self.assertEqual(res['result'], self.test_location_01)
+        self.assertEqual(sorted(res['udes_metrics']),
+                         ['queries', 'records', 'sql_time', 'wall_time'])
+        self.assertGreater(res['udes_metrics']['queries'], 0)
+
+    def test03_instrumented_in_call_metrics(self):
+        """ Checks that instrumented calls inside CallMetrics are counted
+        """
+        Location = self.env['stock.location']
+        self.env.invalidate_all()
+        with CallMetrics(self.env.cr) as metrics:
+            Location.get_location(self.test_location_01.barcode)
+        self.assertGreater(metrics.queries, 0)
+        self.assertNotIn('execute', self.env.cr.__dict__)
+
+    def test04_slow_call_logged(self):
+        """ Checks that calls slower than the threshold are logged """
+        Location = self.env['stock.location']
+        Config = self.env['ir.config_parameter']
+        Config.set_param('udes_core.api_metrics_threshold', '0')
+        with self.assertLogs(instrumentation._logger.name, 'INFO') as logs:
+            Location.get_location(self.test_location_01.barcode)
+        self.assertEqual(len(logs.records), 1)
+        line = json.loads(logs.records[0].args[0])
+        self.assertEqual(line['method'], 'stock.location.get_location')
+        self.assertEqual(line['uid'], self.env.uid)
+
+        Config.set_param('udes_core.api_metrics_threshold', '-1')
+        with self.assertRaises(AssertionError):
+            with self.assertLogs(instrumentation._logger.name, 'INFO'):
+                Location.get_location(self.test_location_01.barcode)
+
+    def test05_profile_attachment(self):
+        """ Checks that calls with udes_profile store the profile and SQL
+            trace in a zip attached to the user
+        """
+        Attachment = self.env['ir.attachment']
+        Location = self.env['stock.location']
+        domain = [('res_model', '=', 'res.users'),
+                  ('res_id', '=', self.env.uid),
+                  ('mimetype', '=', 'application/zip')]
+        attachments = Attachment.search(domain)
+
+        Location.with_context(udes_profile=True).get_location(
+            self.test_location_01.barcode)
+        attachment = Attachment.search(domain) - attachments
+        self.assertEqual(len(attachment), 1)
+        self.assertEqual(attachment.description,
+                         'stock.location.get_location')
+        with zipfile.ZipFile(io.BytesIO(
+                base64.b64decode(attachment.datas))) as archive:
+            self.assertEqual(sorted(archive.namelist()),
+                             ['profile.prof', 'profile.txt',
+                              'sql_trace.json'])
+            trace = json.loads(archive.read('sql_trace.json').decode())
+        self.assertEqual(trace['method'], 'stock.location.get_location')
+        self.assertTrue(trace['queries'])
+
+    def test06_profile_user_setting(self):
+        """ Checks that the calls of users with u_profile_api_calls are
+            profiled
+        """
+        Attachment = self.env['ir.attachment']
+        Location = self.env['stock.location']
+        domain = [('res_model', '=', 'res.users'),
+                  ('res_id', '=', self.env.uid),
+                  ('mimetype', '=', 'application/zip')]
+        attachments = Attachment.search(domain)
+
+        self.env.user.u_profile_api_calls = True
+        Location.get_location(self.test_location_01.barcode)
+        self.assertEqual(len(Attachment.search(domain) - attachments), 1)
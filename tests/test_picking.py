@@ -83,3 +83,18 @@ class TestGoodsInPicking(common.BaseUDES):
         info = self.test_picking.get_info(fields_to_fetch=['id'])
         # There should only be one and they should all be the same if not
         self.assertEqual(list(info[0].keys()), ['id'])
+
+    def test07_get_pickings_slow_query_log(self):
+        """ Tests get_pickings logs its query and plan when it is
+            slower than the threshold
+        """
+        Picking = self.env['stock.picking']
+        SlowQuery = self.env['udes.slow.query']
+        self.env['ir.config_parameter'].sudo().set_param(
+            'udes_core.slow_query_threshold', 0)
+        Picking.get_pickings(origin=self.test_picking.origin)
+        slow_query = SlowQuery.search(
+            [('method', '=', 'stock.picking.get_pickings')], limit=1)
+        self.assertEqual(len(slow_query), 1)
+        self.assertIn(self.test_picking.origin, slow_query.query)
+        self.assertIn('Execution', slow_query.plan)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from . import common
+
+
+class TestPickingChanges(common.BaseUDES):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestPickingChanges, cls).setUpClass()
+        cls.create_quant(cls.apple.id, cls.test_location_01.id, 10)
+        products_info = [{'product': cls.apple, 'qty': 4}]
+        cls.test_picking = cls.create_picking(cls.picking_type_internal,
+                                              products_info=products_info,
+                                              confirm=True, assign=True)
+
+    def test01_get_changes_without_cursor(self):
+        """ Checks that the open pickings of the picking types are
+            returned without cursor
+        """
+        Picking = self.env['stock.picking']
+        res = Picking.get_changes(
+            picking_type_ids=self.picking_type_internal.ids)
+        self.assertFalse(res['reset'])
+        self.assertTrue(res['cursor'])
+        self.assertIn(self.test_picking.id,
+                      [info['id'] for info in res['pickings']])
+        self.assertIn(self.test_picking.move_lines.id,
+                      [info['id'] for info in res['moves']])
+        self.assertIn(self.test_picking.move_line_ids.id,
+                      [info['id'] for info in res['move_lines']])
+
+        res = Picking.get_changes(picking_type_ids=[-1])
+        self.assertFalse(res['pickings'])
+
+    def test02_get_changes_removed(self):
+        """ Checks that the changes and removals since the cursor are
+            returned
+        """
+        Picking = self.env['stock.picking']
+        cursor = Picking.get_changes()['cursor']
+
+        move_line = self.test_picking.move_line_ids
+        move_line.unlink()
+        self.test_picking.write({'origin': 'test_changes_origin'})
+        res = Picking.get_changes(
+            cursor, picking_type_ids=self.picking_type_internal.ids)
+        picking_info = [info for info in res['pickings']
+                        if info['id'] == self.test_picking.id]
+        self.assertEqual(picking_info[0]['origin'], 'test_changes_origin')
+        self.assertIn(move_line.id, res['removed']['stock.move.line'])
+
+    def test03_get_changes_reset(self):
+        """ Checks that a cursor older than the tombstones kept resets the
+            list
+        """
+        Picking = self.env['stock.picking']
+        Config = self.env['ir.config_parameter']
+        cursor = Picking.get_changes()['cursor']
+        Config.set_param('udes_core.sync_min_cursor', str(int(cursor) + 1))
+        res = Picking.get_changes(cursor)
+        self.assertTrue(res['reset'])
+        self.assertIn(self.test_picking.id,
+                      [info['id'] for info in res['pickings']])
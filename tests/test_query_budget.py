@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+from . import common
+
+# Maximum number of SQL queries of the hot paths, starting from an empty
+# cache, for the fixed data sizes below: the baseline count of each path
+# plus QUERY_MARGIN. The margin is smaller than the number of lines, so
+# one more query per line fails. When a change is expected to move a
+# count, set its baseline to the number a failure reports.
+QUERY_MARGIN = 10
+GET_INFO_LINES = 50
+# baseline 25: picking, moves, move lines, locations, products and
+# packages each read once
+GET_INFO_QUERIES = 25 + QUERY_MARGIN
+# baseline 8: warehouse, package and picking searches
+GET_PICKINGS_QUERIES = 8 + QUERY_MARGIN
+MARK_AS_DONE_LINES = 100
+# baseline 800: package lookup, then a write and the reads it
+# invalidates for each of the 100 move lines
+MARK_AS_DONE_QUERIES = 800 + QUERY_MARGIN
+
+class TestQueryBudget(common.BaseUDES):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestQueryBudget, cls).setUpClass()
+        Package = cls.env['stock.quant.package']
+
+        cls.products = cls.apple.browse()
+        for i in range(MARK_AS_DONE_LINES):
+            cls.products |= cls.create_product('Budget{}'.format(i))
+
+        cls.info_package = Package.get_package('budget_info', create=True)
+        cls.info_quants = cls.create_package_quants(
+            cls.info_package, cls.products[:GET_INFO_LINES])
+        cls.package = Package.get_package('budget_package', create=True)
+        cls.quants = cls.create_package_quants(cls.package, cls.products)
+
+    @classmethod
+    def create_package_quants(cls, package, products):
+        """ Create a quant of each product in package at test location 01
+        """
+        Quant = cls.env['stock.quant']
+        quants = Quant.browse()
+        for product in products:
+            quants |= cls.create_quant(product.id, cls.test_location_01.id,
+                                       1, package_id=package.id)
+        return quants
+
+    def create_internal_picking(self, quants):
+        """ Create an internal picking with a move line per quant """
+        Picking = self.env['stock.picking']
+        return Picking.create_picking(
+            quants.ids, self.test_location_01.id,
+            picking_type_id=self.picking_type_internal.id)
+
+    def test01_get_info_budget(self):
+        """ Checks the queries of get_info of a 50 line picking """
+        picking = self.create_internal_picking(self.info_quants)
+        with self.assertQueryBudget(GET_INFO_QUERIES):
+            picking.get_info()
+
+    def test02_get_pickings_by_package_name_budget(self):
+        """ Checks the queries of get_pickings by the name of a 100 line
+            package
+        """
+        Picking = self.env['stock.picking']
+        self.create_internal_picking(self.quants)
+        with self.assertQueryBudget(GET_PICKINGS_QUERIES):
+            Picking.get_pickings(package_name=self.package.name)
+
+    def test03_mark_as_done_budget(self):
+        """ Checks the queries of mark_as_done of a 100 line package """
+        picking = self.create_internal_picking(self.quants)
+        move_lines = picking.move_line_ids
+        self.assertEqual(len(move_lines), MARK_AS_DONE_LINES)
+        with self.assertQueryBudget(MARK_AS_DONE_QUERIES):
+            move_lines.mark_as_done(package=self.package.name)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from odoo import api
+from odoo.tools import config
+
+from . import common
+from ..replica import read_replica
+
+
+@read_replica
+def _backend_pid(records):
+    """ Return the pid of the database backend the cursor of records is
+        connected to
+    """
+    records.env.cr.execute("SELECT pg_backend_pid()")
+    return records.env.cr.fetchone()[0]
+
+
+@read_replica
+def _environments(records):
+    """ Return the environments records are read with """
+    return records.env.all
+
+
+@read_replica
+def _read_name(records):
+    """ Return the name of records as read by the call """
+    return records.name
+
+
+# These tests need a second database server, e.g., a local streaming
+# replica or a copy of the database, configured with udes_replica_dsn.
+@unittest.skipUnless(config.get('udes_replica_dsn'),
+                     'Set udes_replica_dsn to test the read only database')
+class TestReplica(common.BaseUDES):
+
+    def primary_pid(self, cr):
+        cr.execute("SELECT pg_backend_pid()")
+        return cr.fetchone()[0]
+
+    def test01_read_on_replica(self):
+        """ Checks that a read only call of a transaction that has not
+            written runs on the replica, and recordsets returned are
+            bound to the primary database
+        """
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, {})
+            Location = env['stock.location']
+            self.assertNotEqual(_backend_pid(Location),
+                                self.primary_pid(cr))
+
+            location = Location.get_location(self.stock_location.id)
+            self.assertEqual(location.id, self.stock_location.id)
+            self.assertIs(location.env.cr, cr)
+
+    def test02_read_after_write_on_primary(self):
+        """ Checks that a transaction that has written reads from the
+            primary database
+        """
+        Location = self.env['stock.location']
+        self.assertEqual(_backend_pid(Location),
+                         self.primary_pid(self.env.cr))
+
+    def test03_no_replica_on_primary(self):
+        """ Checks that udes_no_replica and calls inside another API
+            call run on the primary database
+        """
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, {})
+            Location = env['stock.location']
+            self.assertEqual(
+                _backend_pid(Location.with_context(udes_no_replica=True)),
+                self.primary_pid(cr))
+
+            cr._udes_metrics = object()
+            try:
+                self.assertEqual(_backend_pid(Location),
+                                 self.primary_pid(cr))
+            finally:
+                cr._udes_metrics = None
+
+    def test04_replica_environments(self):
+        """ Checks that the replica is read with its own environments,
+            leaving the record cache of the primary database alone
+        """
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, {})
+            Location = env['stock.location']
+            self.assertIsNot(_environments(Location), env.all)
+            self.assertIs(api.Environment.envs, env.all)
+
+    def test05_read_after_committed_write(self):
+        """ Checks that a call right after a committed write of the same
+            user reads the new value
+        """
+        name = self.stock_location.name
+        try:
+            with self.registry.cursor() as cr:
+                env = api.Environment(cr, self.env.uid, {})
+                env['stock.location'].browse(self.stock_location.id).write(
+                    {'name': 'UDES replica test'})
+            with self.registry.cursor() as cr:
+                env = api.Environment(cr, self.env.uid, {})
+                location = env['stock.location'].browse(
+                    self.stock_location.id)
+                self.assertEqual(_read_name(location), 'UDES replica test')
+        finally:
+            with self.registry.cursor() as cr:
+                env = api.Environment(cr, self.env.uid, {})
+                env['stock.location'].browse(self.stock_location.id).write(
+                    {'name': name})
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+from odoo.exceptions import ValidationError
+from . import common
+
+
+class TestScanIdentifier(common.BaseUDES):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestScanIdentifier, cls).setUpClass()
+        cls.ScanIdentifier = cls.env['udes.scan.identifier']
+
+    def test01_resolve_location_and_product(self):
+        """ Checks that locations and products are resolved from their
+            barcodes
+        """
+        res = self.ScanIdentifier.resolve_scan('LTEST01')
+        self.assertEqual(res['kind'], 'location')
+        self.assertEqual(res['id'], self.test_location_01.id)
+        self.assertEqual(res['info']['id'], self.test_location_01.id)
+
+        res = self.ScanIdentifier.resolve_scan('productApple')
+        self.assertEqual(res['kind'], 'product')
+        self.assertEqual(res['id'], self.apple.id)
+
+    def test02_resolve_package_and_serial(self):
+        """ Checks that packages and serial numbers are resolved from
+            their names
+        """
+        Package = self.env['stock.quant.package']
+        Lot = self.env['stock.production.lot']
+
+        package = Package.create({'name': 'UDESSCAN01'})
+        serial = Lot.create({'name': 'SN-UDESSCAN01',
+                             'product_id': self.strawberry.id})
+
+        res = self.ScanIdentifier.resolve_scan('UDESSCAN01')
+        self.assertEqual(res['kind'], 'package')
+        self.assertEqual(res['id'], package.id)
+
+        res = self.ScanIdentifier.resolve_scan('SN-UDESSCAN01')
+        self.assertEqual(res['kind'], 'serial')
+        self.assertEqual(res['id'], serial.id)
+        self.assertEqual(res['info']['name'], serial.display_name)
+
+    def test03_identifiers_kept_in_sync(self):
+        """ Checks that the identifiers follow renames and archiving """
+        self.test_location_02.barcode = 'LUDESSCAN02'
+        res = self.ScanIdentifier.resolve_scan('LUDESSCAN02')
+        self.assertEqual(res['id'], self.test_location_02.id)
+        with self.assertRaises(ValidationError):
+            self.ScanIdentifier.resolve_scan('LTEST02')
+
+        self.banana.active = False
+        with self.assertRaises(ValidationError):
+            self.ScanIdentifier.resolve_scan('productBanana')
+
+    def test04_resolve_ambiguous_identifier(self):
+        """ Checks that an identifier of several records is reported """
+        Package = self.env['stock.quant.package']
+
+        Package.create({'name': 'productCherry'})
+        with self.assertRaises(ValidationError) as e:
+            self.ScanIdentifier.resolve_scan('productCherry')
+        self.assertIn('package', e.exception.name)
+        self.assertIn('product', e.exception.name)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+from . import common
+
+
+class TestStockImport(common.BaseUDES):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestStockImport, cls).setUpClass()
+        cls.StockImport = cls.env['udes.stock.import']
+        cls.Quant = cls.env['stock.quant']
+
+    def test01_import_stock(self):
+        """ Checks that quants, packages and lots are created from the
+            rows, summing the rows of the same quant
+        """
+        data = ('location_barcode,product_barcode,quantity,package_name,'
+                'lot_name\n'
+                'LTEST01,productApple,4,UDESIMP01,\n'
+                'LTEST01,productApple,2,UDESIMP01,\n'
+                'LTEST02,productStrawberry,1,,SN-UDESIMP01\n')
+        res = self.StockImport.import_stock(data)
+        self.assertEqual(res['quants'], 2)
+        self.assertEqual(res['packages'], 1)
+        self.assertEqual(res['lots'], 1)
+        self.assertEqual(res['rejected'], [])
+
+        apple_quant = self.Quant.search([
+            ('product_id', '=', self.apple.id),
+            ('location_id', '=', self.test_location_01.id)])
+        self.assertEqual(apple_quant.quantity, 6)
+        self.assertEqual(apple_quant.package_id.name, 'UDESIMP01')
+        self.assertEqual(apple_quant.package_id.location_id,
+                         self.test_location_01)
+        strawberry_quant = self.Quant.search([
+            ('product_id', '=', self.strawberry.id),
+            ('location_id', '=', self.test_location_02.id)])
+        self.assertEqual(strawberry_quant.lot_id.name, 'SN-UDESIMP01')
+
+    def test02_import_stock_updates_quants(self):
+        """ Checks that the quantity of an existing quant is replaced """
+        quant = self.create_quant(self.banana.id,
+                                  self.test_location_01.id, 3)
+        data = ('product_barcode\tlocation_barcode\tquantity\n'
+                'productBanana\tLTEST01\t8\n')
+        res = self.StockImport.import_stock(data, delimiter='\t')
+        self.assertEqual(res['quants'], 1)
+        quant.invalidate_cache()
+        self.assertEqual(quant.quantity, 8)
+
+    def test03_import_stock_rejected_rows(self):
+        """ Checks that invalid rows are reported without aborting the
+            import of the valid ones
+        """
+        self.create_quant(self.cherry.id, self.test_location_01.id, 5,
+                          reserved_quantity=4)
+        data = ('location_barcode,product_barcode,quantity\n'
+                'LTEST01,productApple,3\n'
+                'LNOTEXIST,productApple,3\n'
+                'LTEST01,productNotExist,3\n'
+                'LTEST01,productApple,three\n'
+                'LTEST01,productStrawberry,1\n'
+                'LTEST01,productCherry,2\n')
+        res = self.StockImport.import_stock(data)
+        self.assertEqual(res['quants'], 1)
+        self.assertEqual([row['line'] for row in res['rejected']],
+                         [3, 4, 5, 6, 7])
+        self.assertEqual(res['rejected'][0]['error'], 'Unknown location')
+        self.assertEqual(res['rejected'][1]['error'], 'Unknown product')
+        self.assertEqual(res['rejected'][2]['error'], 'Invalid quantity')
+
+    def test04_import_stock_malformed_rows(self):
+        """ Checks that rows with a wrong number of columns or unbalanced
+            quotes are rejected, with their line in the file, without
+            aborting the import
+        """
+        data = ('location_barcode,product_barcode,quantity\n'
+                'LTEST01,productApple,2\n'
+                'LTEST01,productApple\n'
+                'LTEST01,"productBanana,1\n'
+                '"LTEST01","productBanana",1\n')
+        res = self.StockImport.import_stock(data)
+        self.assertEqual(res['quants'], 2)
+        self.assertEqual(res['rejected'], [
+            {'line': 3, 'error': 'Wrong number of columns'},
+            {'line': 4, 'error': 'Malformed row'},
+        ])
+
+    def test05_import_stock_no_records_for_rejected_rows(self):
+        """ Checks that no package or lot is created for rows rejected
+            after their package and lot have been resolved
+        """
+        Package = self.env['stock.quant.package']
+        Lot = self.env['stock.production.lot']
+        data = ('location_barcode,product_barcode,quantity,package_name,'
+                'lot_name\n'
+                'LTEST02,productStrawberry,1,UDESIMP02,SN-UDESIMP02\n'
+                'LTEST02,productStrawberry,1,UDESIMP02,SN-UDESIMP02\n')
+        res = self.StockImport.import_stock(data)
+        self.assertEqual(res['packages'], 0)
+        self.assertEqual(res['lots'], 0)
+        self.assertEqual([row['error'] for row in res['rejected']],
+                         ['Serial number repeated in the file'] * 2)
+        self.assertFalse(Package.search([('name', '=', 'UDESIMP02')]))
+        self.assertFalse(Lot.search([('name', '=', 'SN-UDESIMP02')]))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+from odoo import SUPERUSER_ID, api
+
+from . import common
+
+
+class TestStockLocation(common.BaseUDES):
+
+    def test01_filter_children_of(self):
+        """ Checks that only the locations under the given location are
+            kept
+        """
+        locations = self.test_locations | self.env.ref(
+            'stock.stock_location_suppliers')
+        self.assertEqual(
+            locations.filter_children_of(self.stock_location.id),
+            self.test_locations)
+        self.assertEqual(
+            locations.filter_children_of(self.test_location_01.id),
+            self.test_location_01)
+
+    def test02_filter_children_of_moved_location(self):
+        """ Checks that the index follows the moves of locations """
+        Location = self.env['stock.location']
+        self.assertFalse(self.test_location_02.filter_children_of(
+            self.test_location_01.id))
+        intervals = Location._get_location_intervals()
+
+        self.test_location_02.location_id = self.test_location_01
+        self.assertNotEqual(Location._get_location_intervals(), intervals)
+        self.assertEqual(
+            self.test_location_02.filter_children_of(
+                self.test_location_01.id),
+            self.test_location_02)
+
+    def test03_filter_children_of_archived_location(self):
+        """ Checks that archived locations are not children of any
+            location
+        """
+        Location = self.env['stock.location']
+        self.test_location_01.active = False
+        self.assertNotIn(self.test_location_01.id,
+                         Location._get_location_intervals())
+        self.assertFalse(self.test_location_01.filter_children_of(
+            self.stock_location.id))
+
+    def test04_cached_index(self):
+        """ Checks that the index is cached by the transactions that have
+            not changed the tree, and read again by the ones that have
+        """
+        with api.Environment.manage(), self.registry.cursor() as cr:
+            try:
+                Location = api.Environment(cr, SUPERUSER_ID, {})[
+                    'stock.location']
+                intervals = Location._get_location_intervals()
+                self.assertIs(Location._get_location_intervals(), intervals)
+
+                location = Location.create({
+                    'name': 'Cached index',
+                    'location_id': self.stock_location.id,
+                })
+                self.assertIn(location.id,
+                              Location._get_location_intervals())
+                self.assertNotIn(location.id,
+                                 Location._get_cached_location_intervals())
+            finally:
+                cr.rollback()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+from odoo import SUPERUSER_ID, api
+from odoo.exceptions import ValidationError
+from . import common
+
+
+class TestStockQuant(common.BaseUDES):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestStockQuant, cls).setUpClass()
+        Package = cls.env['stock.quant.package']
+
+        cls.package = Package.get_package('test_quant_package', create=True)
+        cls.apple_quant = cls.create_quant(cls.apple.id,
+                                           cls.test_location_01.id, 5,
+                                           package_id=cls.package.id)
+        cls.banana_quant = cls.create_quant(cls.banana.id,
+                                            cls.test_location_01.id, 3,
+                                            package_id=cls.package.id)
+        cls.cherry_quant = cls.create_quant(cls.cherry.id,
+                                            cls.test_location_02.id, 2)
+
+    def test01_assert_not_reserved_success(self):
+        """ Checks that unreserved quants pass the check """
+        quants = self.apple_quant | self.banana_quant | self.cherry_quant
+        quants.assert_not_reserved()
+
+    def test02_assert_not_reserved_package(self):
+        """ Checks that reserved quants in a package report the package """
+        self.banana_quant.reserved_quantity = 1
+        quants = self.apple_quant | self.banana_quant
+        with self.assertRaises(ValidationError) as e:
+            quants.assert_not_reserved()
+        self.assertIn(self.package.name, e.exception.name)
+
+    def test03_assert_not_reserved_product(self):
+        """ Checks that reserved quants without package report the
+            product
+        """
+        self.cherry_quant.reserved_quantity = 1
+        with self.assertRaises(ValidationError) as e:
+            self.cherry_quant.assert_not_reserved()
+        self.assertIn(self.cherry.display_name, e.exception.name)
+
+    def test04_assert_entire_packages_success(self):
+        """ Checks that all the quants of a package pass the check """
+        quants = self.apple_quant | self.banana_quant | self.cherry_quant
+        quants.assert_entire_packages()
+
+    def test05_assert_entire_packages_incomplete(self):
+        """ Checks that part of a package is reported as incomplete """
+        with self.assertRaises(ValidationError) as e:
+            self.apple_quant.assert_entire_packages()
+        self.assertIn(self.package.name, e.exception.name)
+
+    def test06_group_quantity_by_product(self):
+        """ Checks the quantities of the quants are grouped by product """
+        quants = self.apple_quant | self.banana_quant | self.cherry_quant
+        self.assertEqual(quants.group_quantity_by_product(),
+                         {self.apple.id: 5, self.banana.id: 3,
+                          self.cherry.id: 2})
+        self.assertEqual(quants.total_quantity(), 10)
+
+    def test07_aggregate_quantities_multiple_keys(self):
+        """ Checks that quantities and reserved quantities are grouped
+            by several fields, including unset ones.
+        """
+        self.banana_quant.reserved_quantity = 1
+        quants = self.apple_quant | self.banana_quant | self.cherry_quant
+        res = quants.aggregate_quantities(groupby=('location_id', 'package_id'))
+        self.assertEqual(res, {
+            (self.test_location_01.id, self.package.id):
+                {'quantity': 8, 'reserved_quantity': 1},
+            (self.test_location_02.id, False):
+                {'quantity': 2, 'reserved_quantity': 0},
+        })
+
+    def test08_aggregate_quantities_empty(self):
+        """ Checks the total quantity of no quants is zero """
+        Quant = self.env['stock.quant']
+        self.assertEqual(Quant.browse().total_quantity(), 0)
+
+    def test09_stock_levels_follow_quants(self):
+        """ Checks the stock levels are updated when quants are created,
+            updated and deleted.
+        """
+        StockLevel = self.env['udes.stock.level']
+        locations = [self.test_location_01.id]
+        levels = StockLevel.get_quantities(locations,
+                                           product_ids=[self.apple.id])
+        self.assertEqual(levels[self.apple.id]['quantity'], 5)
+
+        self.apple_quant.write({'quantity': 7, 'reserved_quantity': 2})
+        levels = StockLevel.get_quantities(locations,
+                                           product_ids=[self.apple.id])
+        self.assertEqual(levels[self.apple.id],
+                         {'quantity': 7, 'reserved_quantity': 2})
+
+        self.apple_quant.location_id = self.test_location_02
+        levels = StockLevel.get_quantities(locations,
+                                           product_ids=[self.apple.id])
+        self.assertEqual(levels[self.apple.id]['quantity'], 0)
+
+    def test10_stock_levels_include_children(self):
+        """ Checks the stock levels of a location include its children """
+        StockLevel = self.env['udes.stock.level']
+        product_ids = [self.apple.id, self.cherry.id]
+        levels = StockLevel.get_quantities([self.stock_location.id],
+                                           product_ids=product_ids)
+        self.assertEqual(levels[self.apple.id]['quantity'], 5)
+        self.assertEqual(levels[self.cherry.id]['quantity'], 2)
+
+        levels = StockLevel.get_quantities([self.stock_location.id],
+                                           product_ids=product_ids,
+                                           include_children=False)
+        self.assertEqual(levels, {})
+
+    def test11_packages_with_same_content(self):
+        """ Checks packages with the same content are found by their
+            content hash.
+        """
+        Package = self.env['stock.quant.package']
+        other_package = Package.get_package('test_quant_package_2',
+                                            create=True)
+        self.create_quant(self.apple.id, self.test_location_02.id, 5,
+                          package_id=other_package.id)
+        banana_quant = self.create_quant(self.banana.id,
+                                         self.test_location_02.id, 3,
+                                         package_id=other_package.id)
+        self.assertTrue(self.package.has_same_content(other_package))
+        self.assertEqual(self.package.get_packages_with_same_content(),
+                         other_package)
+
+        banana_quant.quantity = 2
+        self.assertFalse(self.package.has_same_content(other_package))
+        self.assertFalse(self.package.get_packages_with_same_content())
+
+    def test12_nested_packages(self):
+        """ Checks the descendants, contained quants and root of nested
+            packages.
+        """
+        Package = self.env['stock.quant.package']
+        pallet = Package.get_package('test_pallet', create=True)
+        carton = Package.get_package('test_carton', create=True)
+        carton.u_parent_package_id = pallet
+        self.package.u_parent_package_id = carton
+        cherry_quant = self.create_quant(self.cherry.id,
+                                         self.test_location_01.id, 1,
+                                         package_id=carton.id)
+
+        self.assertEqual(pallet.get_all_descendants(), carton | self.package)
+        self.assertEqual(pallet.get_all_contained_quants(),
+                         self.apple_quant | self.banana_quant | cherry_quant)
+        self.assertEqual(self.package.get_root_package(), pallet)
+        self.assertEqual(self.apple_quant._with_parent_packages(),
+                         self.apple_quant | self.banana_quant | cherry_quant)
+
+        with self.assertRaises(ValidationError):
+            pallet.u_parent_package_id = self.package
+
+    def test13_consolidate_stock_levels(self):
+        """ Checks consolidating the stock levels keeps the quantities and
+            removes the products no longer in a location
+        """
+        StockLevel = self.env['udes.stock.level']
+        self.apple_quant.location_id = self.test_location_02
+        StockLevel._consolidate()
+        self.assertFalse(StockLevel.search([
+            ('location_id', '=', self.test_location_01.id),
+            ('product_id', '=', self.apple.id),
+        ]))
+        levels = StockLevel.get_quantities(
+            [self.test_location_02.id],
+            product_ids=[self.apple.id, self.cherry.id])
+        self.assertEqual(levels[self.apple.id]['quantity'], 5)
+        self.assertEqual(levels[self.cherry.id]['quantity'], 2)
+
+    def test14_stock_levels_concurrent_transactions(self):
+        """ Checks transactions changing quants of the same product in the
+            same location do not wait for each other. The quants have to
+            be committed to be changed by other transactions, so they are
+            created and removed in their own transactions.
+        """
+        with api.Environment.manage(), self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            product = env['product.product'].create({
+                'name': 'Concurrent stock level',
+                'barcode': 'productConcurrentStockLevel',
+                'type': 'product',
+            })
+            quants = env['stock.quant']
+            for _i in range(2):
+                quants |= quants.create({
+                    'product_id': product.id,
+                    'location_id': self.stock_location.id,
+                    'quantity': 1,
+                })
+            product_id = product.id
+            quant_ids = quants.ids
+
+        try:
+            with self.registry.cursor() as cr1, \
+                    self.registry.cursor() as cr2:
+                try:
+                    for cr, quant_id in zip((cr1, cr2), quant_ids):
+                        cr.execute("SET LOCAL lock_timeout = '2s'")
+                        cr.execute("UPDATE stock_quant "
+                                   "SET quantity = quantity + 1 "
+                                   "WHERE id = %s", (quant_id,))
+                finally:
+                    cr1.rollback()
+                    cr2.rollback()
+        finally:
+            with api.Environment.manage(), self.registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                env['stock.quant'].browse(quant_ids).unlink()
+                env['product.product'].browse(product_id).unlink()
+
+    def test15_empty_package_same_content(self):
+        """ Checks no package has the same content as an empty package """
+        Package = self.env['stock.quant.package']
+        empty_package = Package.get_package('test_empty_package',
+                                            create=True)
+        Package.get_package('test_empty_package_2', create=True)
+        self.assertFalse(empty_package.u_content_hash)
+        self.assertFalse(empty_package.get_packages_with_same_content())
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from odoo.exceptions import AccessError, ValidationError
+from . import common
+
+
+class TestUdesJob(common.BaseUDES):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestUdesJob, cls).setUpClass()
+        cls.manager = cls.create_user(
+            'Stock Manager', 'udes_job_manager',
+            groups_id=[(6, 0, [cls.env.ref('stock.group_stock_manager').id])])
+
+    def test01_enqueue_private_method(self):
+        """ Checks that methods not allowed as jobs cannot be enqueued """
+        Job = self.env['udes.job']
+        with self.assertRaises(ValidationError):
+            Job.enqueue(self.test_location_01, '_get_location_intervals')
+
+    def test02_run_job_not_allowed(self):
+        """ Checks that a job of a method not allowed fails when run """
+        Job = self.env['udes.job']
+        job = Job.sudo().create({
+            'name': 'Not allowed',
+            'model_name': 'res.users',
+            'res_ids': '[%d]' % self.env.uid,
+            'method': 'unlink',
+            'user_id': self.env.uid,
+        })
+        job.run_job()
+        self.assertEqual(job.state, 'failed')
+        self.assertTrue(self.env.user.exists())
+
+    def test03_manager_cannot_create_job(self):
+        """ Checks that stock managers cannot create or change jobs """
+        Job = self.env['udes.job'].sudo(self.manager)
+        with self.assertRaises(AccessError):
+            Job.create({
+                'name': 'Escalation',
+                'model_name': 'stock.picking',
+                'method': 'action_done',
+                'user_id': self.env.ref('base.user_root').id,
+            })
+
+    def test04_retry_job_later(self):
+        """ Checks that a job retried after a concurrency error is not
+            run again before its next attempt date
+        """
+        Job = self.env['udes.job']
+        self.env.cr.execute("UPDATE udes_job SET state = 'done' "
+                            "WHERE state = 'pending'")
+        job = Job.enqueue(self.test_location_01, '_track_active_change',
+                          False)
+        self.assertEqual(Job._acquire_pending_job(), job)
+
+        job._retry_later()
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.state, 'pending')
+        self.assertFalse(Job._acquire_pending_job())
+
+        job.sudo().write({'date_next_attempt': '2000-01-01 00:00:00'})
+        self.assertEqual(Job._acquire_pending_job(), job)
@@ -514,3 +514,132 @@ class TestGoodsInUpdatePicking(common.BaseUDES):
         picking.update_picking(validate=True)
         self.assertEqual(picking.state, 'done',
                          'Stock picking is not in state done after validation.')
+
+    def test20_update_picking_validate_async(self):
+        """ Checks that update_picking with validate_async enqueues the
+            validation of the picking and returns the job information.
+        """
+        Job = self.env['udes.job']
+        create_info = [{'product': self.apple, 'qty': 4}]
+        picking = self.create_picking(self.picking_type_in,
+                                      products_info=create_info,
+                                      confirm=True)
+
+        products_info = [{'product_barcode': self.apple.barcode, 'qty': 4}]
+        picking.update_picking(products_info=products_info)
+        job_info = picking.update_picking(validate=True, validate_async=True)
+        self.assertEqual(job_info['state'], 'pending')
+        self.assertNotEqual(picking.state, 'done',
+                            'Stock picking should not be validated yet.')
+
+        job = Job.get_job(job_info['id'])
+        job.run_job()
+        self.assertEqual(job.get_info()[0]['state'], 'done')
+        self.assertEqual(picking.state, 'done',
+                         'Stock picking is not in state done after validation.')
+
+    def test21_update_picking_idempotency_key_replay(self):
+        """ Checks that replaying update_picking with the same
+            idempotency key returns the stored result instead of
+            failing because the operation is already done.
+        """
+        create_info = [{'product': self.apple, 'qty': 4}]
+        picking = self.create_picking(self.picking_type_in,
+                                      products_info=create_info,
+                                      confirm=True)
+
+        products_info = [{'product_barcode': self.apple.barcode, 'qty': 4}]
+        picking.update_picking(products_info=products_info,
+                               idempotency_key='test21-key')
+        picking.update_picking(products_info=products_info,
+                               idempotency_key='test21-key')
+        self.assertEqual(picking.move_lines.quantity_done, 4)
+
+        with self.assertRaises(ValidationError) as e:
+            picking.update_picking(products_info=products_info)
+        self.assertEqual(e.exception.name, 'The operation is already done')
+
+    def _hold_update_lock(self, cr, picking):
+        """ Take the update lock of picking in cursor cr """
+        cr.execute("""
+            SELECT pg_advisory_xact_lock(
+                'stock_picking'::regclass::oid::integer, %s)
+        """, (picking.id,))
+
+    def test22_update_picking_locked(self):
+        """ Checks that update_picking fails when another transaction
+            holds the update lock of the picking for longer than the
+            timeout, without changing the picking.
+        """
+        Config = self.env['ir.config_parameter']
+        Config.set_param('udes_core.picking_lock_timeout', '0.1')
+        create_info = [{'product': self.apple, 'qty': 4}]
+        picking = self.create_picking(self.picking_type_in,
+                                      products_info=create_info,
+                                      confirm=True)
+
+        products_info = [{'product_barcode': self.apple.barcode, 'qty': 4}]
+        with self.registry.cursor() as cr:
+            self._hold_update_lock(cr, picking)
+            with self.assertRaises(ValidationError) as e:
+                picking.update_picking(products_info=products_info)
+            self.assertIn('being updated by another user', e.exception.name)
+        self.assertEqual(picking.move_lines.quantity_done, 0)
+
+        # the lock is released with the other transaction
+        picking.update_picking(products_info=products_info)
+        self.assertEqual(picking.move_lines.quantity_done, 4)
+
+    def test23_validate_async_locked(self):
+        """ Checks that the asynchronous validation takes the update lock
+            of the picking.
+        """
+        Job = self.env['udes.job']
+        Config = self.env['ir.config_parameter']
+        Config.set_param('udes_core.picking_lock_timeout', '0.1')
+        create_info = [{'product': self.apple, 'qty': 4}]
+        picking = self.create_picking(self.picking_type_in,
+                                      products_info=create_info,
+                                      confirm=True)
+
+        products_info = [{'product_barcode': self.apple.barcode, 'qty': 4}]
+        picking.update_picking(products_info=products_info)
+        job_info = picking.update_picking(validate=True, validate_async=True)
+        job = Job.get_job(job_info['id'])
+        with self.registry.cursor() as cr:
+            self._hold_update_lock(cr, picking)
+            job.run_job()
+        self.assertEqual(job.state, 'failed')
+        self.assertNotEqual(picking.state, 'done')
+
+    def test24_update_picking_idempotency_key_mismatch(self):
+        """ Checks that an idempotency key cannot be used again for
+            another picking or other arguments, and that expired keys
+            are used again.
+        """
+        IdempotencyKey = self.env['udes.idempotency.key']
+        create_info = [{'product': self.apple, 'qty': 4}]
+        picking = self.create_picking(self.picking_type_in,
+                                      products_info=create_info,
+                                      confirm=True)
+        other_picking = self.create_picking(self.picking_type_in,
+                                            products_info=create_info,
+                                            confirm=True)
+
+        products_info = [{'product_barcode': self.apple.barcode, 'qty': 2}]
+        picking.update_picking(products_info=products_info,
+                               idempotency_key='test24-key')
+        with self.assertRaises(ValidationError):
+            other_picking.update_picking(products_info=products_info,
+                                         idempotency_key='test24-key')
+        with self.assertRaises(ValidationError):
+            picking.update_picking(
+                products_info=[{'product_barcode': self.apple.barcode,
+                                'qty': 1}],
+                idempotency_key='test24-key')
+
+        IdempotencyKey.sudo().search([('key', '=', 'test24-key')]).write(
+            {'expiry_date': '2000-01-01 00:00:00'})
+        other_picking.update_picking(products_info=products_info,
+                                     idempotency_key='test24-key')
+        self.assertEqual(other_picking.move_lines.quantity_done, 2)